@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """带过期时间和容量上限的LRU缓存
+
+    同时限制条目数和近似字节数，超出时按最近最少使用淘汰。
+    过期的条目不会立即删除，上游不可用时仍可通过 get_stale 读取。
+    缓存的值由调用方共享，取出后不应修改。
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取未过期的缓存值，不存在或已过期返回None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """获取缓存值，不检查是否过期"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any, size: int = 0, ttl: Optional[float] = None):
+        """写入缓存，size为值的近似字节数"""
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, size, value)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import httpx
+
+from tmdb_client import tmdb_get, cache_ttl
+from upstream_priority import upstream_priority, PREFETCH
+from routers.movies import popular_request
+from routers.games import refresh_free_games, FREETOGAME_CACHE_TTL
+
+# 预热热门电影、电视剧的前N页
+CACHE_WARM_ENABLED = os.getenv("CACHE_WARM_ENABLED", "true").lower() == "true"
+CACHE_WARM_PAGES = int(os.getenv("CACHE_WARM_PAGES", "3"))
+# 两次预热的间隔（秒），默认在缓存过期前刷新
+CACHE_WARM_INTERVAL = float(os.getenv(
+    "CACHE_WARM_INTERVAL",
+    str(min(cache_ttl("popular"), FREETOGAME_CACHE_TTL) * 0.8)
+))
+# 预热失败后的重试间隔（秒）
+CACHE_WARM_RETRY_INTERVAL = float(os.getenv("CACHE_WARM_RETRY_INTERVAL", "60"))
+
+POPULAR_MEDIA_TYPES = ("movie", "tv")
+
+class CacheWarmer:
+    """热门列表缓存预热
+
+    启动后在后台获取热门电影、电视剧的前几页和FreeToGame游戏列表，
+    之后在缓存过期前定期刷新，第一个请求不用等待上游。
+    请求逐个发送，以预取优先级经过TMDB限流器，不占用用户请求的额度。
+    题材列表由题材目录常驻内存并自行刷新，这里不重复获取。
+    """
+
+    def __init__(self, pages: int = CACHE_WARM_PAGES, interval: float = CACHE_WARM_INTERVAL):
+        self.pages = pages
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.warmed = 0
+        self.failed = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def warm(self, client: httpx.AsyncClient) -> bool:
+        """刷新一轮，返回是否全部成功"""
+        started = time.monotonic()
+        errors = []
+
+        for media_type in POPULAR_MEDIA_TYPES:
+            for page in range(1, self.pages + 1):
+                url, params = popular_request(media_type, page)
+                try:
+                    await tmdb_get(client, url, params, force_refresh=True)
+                    self.warmed += 1
+                except Exception as e:
+                    self.failed += 1
+                    errors.append(f"{media_type}/popular 第{page}页: {str(e)}")
+
+        try:
+            await refresh_free_games(client)
+            self.warmed += 1
+        except Exception as e:
+            self.failed += 1
+            errors.append(f"FreeToGame: {str(e)}")
+
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        self.last_duration = round(time.monotonic() - started, 3)
+        self.last_error = "; ".join(errors) if errors else None
+        if errors:
+            print(f"缓存预热部分失败: {self.last_error}")
+        return not errors
+
+    def start(self, client: httpx.AsyncClient):
+        """启动后台预热任务，不等待首轮完成"""
+        if CACHE_WARM_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._warm_loop(client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _warm_loop(self, client: httpx.AsyncClient):
+        while True:
+            try:
+                with upstream_priority(PREFETCH):
+                    ok = await self.warm(client)
+            except Exception as e:
+                ok = False
+                self.last_error = str(e)
+                print(f"缓存预热失败: {str(e)}")
+            # 失败时提前重试，上游恢复后尽快补全缓存
+            await asyncio.sleep(self.interval if ok else min(self.interval, CACHE_WARM_RETRY_INTERVAL))
+
+    def status(self) -> Dict:
+        return {
+            "enabled": CACHE_WARM_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "pages": self.pages,
+            "interval": self.interval,
+            "runs": self.runs,
+            "warmed": self.warmed,
+            "failed": self.failed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error
+        }
+
+cache_warmer = CacheWarmer()
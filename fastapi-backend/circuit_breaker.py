@@ -0,0 +1,71 @@
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitBreaker:
+    """上游熔断器
+
+    连续失败达到阈值后进入 open 状态，期间直接拒绝请求；
+    经过恢复时间后进入 half_open，只放行一个探测请求，
+    探测成功则恢复 closed，失败则重新 open。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        """是否允许向上游发送请求"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+
+        # half_open：同一时间只放行一个探测请求
+        if self._probe_in_flight:
+            self.rejected += 1
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """探测请求被取消时释放名额，不计入成功或失败"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
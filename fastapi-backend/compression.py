@@ -0,0 +1,194 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from cache import TTLCache
+from conditional import etag_matches, make_etag, not_modified, representation_etag
+
+try:
+    import brotli
+except ImportError:  # 已列入requirements.txt；未安装时只使用gzip
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # 已列入requirements.txt；未安装时退回到标准库json
+    orjson = None
+
+# 小于该字节数的响应不压缩
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# 可缓存接口的响应体缓存（秒），保存序列化后的JSON和已压缩的版本
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """根据Accept-Encoding选择压缩方式，优先brotli，都不接受时返回None"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = COMPRESSION_BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            # 流式响应（如NDJSON搜索）每块都立即刷新，不增加延迟
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+class CompressionMiddleware:
+    """按Accept-Encoding协商brotli/gzip压缩响应
+
+    小于 COMPRESSION_MIN_SIZE 的响应、图片等已压缩的类型，
+    以及已经设置了Content-Encoding（预压缩）的响应保持原样。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        encoding = choose_encoding(accept_encoding)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=COMPRESSION_GZIP_LEVEL)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+def render_json(data: Any) -> bytes:
+    """序列化JSON响应体：安装orjson时使用orjson，否则与JSONResponse相同的标准库序列化方式"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """使用 render_json 序列化的JSON响应
+
+    路由直接返回该响应时，FastAPI不再对数据执行 jsonable_encoder，
+    适合已经是JSON结构的大响应（TMDB转发的数据、搜索结果等）。
+    声明了 response_model 的路由由Pydantic直接序列化，不需要使用。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+class EncodedBody:
+    """序列化后的JSON响应体，按需生成并保存各压缩版本"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = make_etag(hashlib.sha1(body).hexdigest())
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+    @property
+    def size(self) -> int:
+        # 按原文加上可能的两份压缩版本估算
+        return len(self.body) * 3 // 2
+
+response_cache = TTLCache("responses", RESPONSE_CACHE_TTL, max_entries=500, max_bytes=32 * 1024 * 1024)
+
+def encoded_response(
+    request: Request,
+    encoded: EncodedBody,
+    headers: Optional[Dict[str, str]] = None,
+    cache_control: Optional[str] = None
+) -> Response:
+    """返回JSON响应体，客户端支持时直接使用保存的压缩版本
+
+    带有内容哈希生成的ETag，If-None-Match匹配时返回304。
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if len(encoded.body) < COMPRESSION_MIN_SIZE:
+        encoding = None
+    etag = representation_etag(encoded.etag, encoding)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, headers)
+
+    headers = {**(headers or {}), "ETag": etag, "Vary": "Accept-Encoding"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if encoding:
+        # 已设置Content-Encoding的响应会被压缩中间件跳过
+        headers["Content-Encoding"] = encoding
+        return Response(encoded.encoded(encoding), media_type="application/json", headers=headers)
+    return Response(encoded.body, media_type="application/json", headers=headers)
+
+async def cached_json_response(
+    request: Request,
+    key: str,
+    build: Callable[[], Awaitable[Any]],
+    headers: Optional[Dict[str, str]] = None,
+    cacheable: Callable[[Any], bool] = lambda data: True,
+    cache_control: Optional[str] = None
+) -> Response:
+    """可缓存接口的响应：缓存序列化和压缩后的响应体，相同的响应体只压缩一次
+
+    build 生成响应数据；cacheable 返回False的数据（例如过期缓存）不写入缓存。
+    """
+    encoded = response_cache.get(key)
+    if encoded is None:
+        data = await build()
+        encoded = EncodedBody(render_json(data))
+        if cacheable(data):
+            response_cache.set(key, encoded, size=encoded.size)
+    return encoded_response(request, encoded, headers, cache_control)
+
+def response_cache_stats() -> Dict[str, Any]:
+    return {**response_cache.stats(), "encodings": list(SUPPORTED_ENCODINGS)}
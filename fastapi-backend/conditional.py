@@ -0,0 +1,38 @@
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+# 各接口的Cache-Control
+CACHE_CONTROL_PUBLIC_SHORT = "public, max-age=300"
+CACHE_CONTROL_PUBLIC_LONG = "public, max-age=3600"
+# 用户私有数据：浏览器可以保存，但每次使用前都要用ETag重新验证
+CACHE_CONTROL_PRIVATE = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    """由内容或版本号生成强ETag（带引号）"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """按协商的压缩方式区分ETag，同一内容的gzip/br/原文是不同的表示"""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否包含该ETag（按弱比较，忽略 W/ 前缀）"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+def not_modified(etag: str, cache_control: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> Response:
+    """304响应，不带响应体"""
+    headers = {**(headers or {}), "ETag": etag, "Vary": "Accept-Encoding"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
@@ -28,7 +28,8 @@ def get_db():
         db.close()
 
 def init_database():
-    from models import User, WatchStatus, Favorite, MovieEdit  # Import models to register them
+    from models import User, WatchStatus, Favorite, MovieEdit, MediaTypeIndex, Title, LibraryVersion  # Import models to register them
+    import library_version  # 注册片单版本号的更新监听
     print("初始化数据库...")
 
     # 创建基础表结构
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from typing import Any, Optional
+
+
+class DeadlineExceeded(Exception):
+    """请求的时间预算已用完
+
+    consumed 记录预算用完时已经处理完的条目数，调用方据此计算续查的位置。
+    """
+
+    def __init__(self, consumed: int = 0):
+        super().__init__("请求的时间预算已用完")
+        self.consumed = consumed
+
+class Deadline:
+    """单个请求的端到端时间预算，在多次上游等待之间共享
+
+    seconds 为None或0时不限制时间。
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    async def wait(self, task: asyncio.Future) -> Any:
+        """等待任务完成并返回结果，预算用完时抛出 DeadlineExceeded
+
+        超时不会取消任务，由调用方决定取消还是让它在后台完成。
+        """
+        if self.expires_at is None:
+            return await task
+        done, _ = await asyncio.wait({task}, timeout=self.remaining())
+        if not done:
+            raise DeadlineExceeded()
+        return task.result()
+
+def detach(task: asyncio.Future):
+    """让超出预算的上游请求在后台完成（结果写入缓存，续查时直接命中）"""
+    # 没有等待者时，避免出现 "exception was never retrieved" 警告
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
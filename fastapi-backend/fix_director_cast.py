@@ -5,73 +5,52 @@
 
 import sys
 import os
-import requests
-import time
+import asyncio
+import httpx
 from typing import Optional, Dict, Any
 
 # 添加当前目录到Python路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from database import SessionLocal
+from database import SessionLocal, init_database
 from models import WatchStatus
+from http_client import get_http_client, close_http_client
+from title_catalog import get_title_details, get_title_credits
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # TMDB API配置
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
 
 class DirectorCastFixer:
     def __init__(self):
         self.db = SessionLocal()
-        self.session = requests.Session()
-        self.rate_limit_delay = 0.25  # TMDB API限制
+        # 请求经过 tmdb_client 的共享限流器，429/5xx 自动退避重试
+        self.client = get_http_client()
         
     def close(self):
         self.db.close()
         
-    def get_movie_details(self, movie_id: int, media_type: str = "movie") -> Optional[Dict[str, Any]]:
-        """从TMDB获取电影详细信息"""
+    async def get_movie_details(self, movie_id: int, media_type: str = "movie") -> Optional[Dict[str, Any]]:
+        """获取电影详细信息（本地影视目录有效时直接读取）"""
         try:
-            endpoint = f"{TMDB_BASE_URL}/{media_type}/{movie_id}"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'language': 'zh-CN'  # 获取中文信息
-            }
-            
-            response = self.session.get(endpoint, params=params)
-            time.sleep(self.rate_limit_delay)  # 遵守API限制
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"  API请求失败: {response.status_code}")
-                return None
-                
+            return await get_title_details(self.client, movie_id, media_type)
+        except httpx.HTTPStatusError as e:
+            print(f"  API请求失败: {e.response.status_code}")
+            return None
         except Exception as e:
             print(f"  获取电影详情失败: {e}")
             return None
     
-    def get_movie_credits(self, movie_id: int, media_type: str = "movie") -> Optional[Dict[str, Any]]:
-        """获取电影演职员信息"""
+    async def get_movie_credits(self, movie_id: int, media_type: str = "movie") -> Optional[Dict[str, Any]]:
+        """获取电影演职员信息（本地影视目录有效时直接读取，否则与详情一次请求获取）"""
         try:
-            endpoint = f"{TMDB_BASE_URL}/{media_type}/{movie_id}/credits"
-            params = {
-                'api_key': TMDB_API_KEY,
-                'language': 'zh-CN'
-            }
-            
-            response = self.session.get(endpoint, params=params)
-            time.sleep(self.rate_limit_delay)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"  获取演职员信息失败: {response.status_code}")
-                return None
-                
+            return await get_title_credits(self.client, movie_id, media_type)
+        except httpx.HTTPStatusError as e:
+            print(f"  获取演职员信息失败: {e.response.status_code}")
+            return None
         except Exception as e:
             print(f"  获取演职员信息失败: {e}")
             return None
@@ -115,7 +94,7 @@ class DirectorCastFixer:
         
         return director, cast
     
-    def fix_record(self, record: WatchStatus, dry_run: bool = True) -> bool:
+    async def fix_record(self, record: WatchStatus, dry_run: bool = True) -> bool:
         """修复单个记录"""
         try:
             # 确定媒体类型
@@ -124,7 +103,7 @@ class DirectorCastFixer:
             print(f"处理: {record.movie_title} (ID: {record.movie_id}, 类型: {media_type})")
             
             # 获取演职员信息
-            credits = self.get_movie_credits(record.movie_id, media_type)
+            credits = await self.get_movie_credits(record.movie_id, media_type)
             if not credits:
                 print(f"  无法获取演职员信息")
                 return False
@@ -156,7 +135,7 @@ class DirectorCastFixer:
             print(f"  处理失败: {e}")
             return False
     
-    def fix_all_records(self, dry_run: bool = True, limit: int = None):
+    async def fix_all_records(self, dry_run: bool = True, limit: int = None):
         """批量修复所有记录"""
         try:
             # 查询所有有导演或主演信息的记录
@@ -178,13 +157,8 @@ class DirectorCastFixer:
             for i, record in enumerate(records, 1):
                 print(f"\n[{i}/{len(records)}]", end=" ")
                 
-                if self.fix_record(record, dry_run):
+                if await self.fix_record(record, dry_run):
                     updated_count += 1
-                
-                # 每处理10个记录暂停一下
-                if i % 10 == 0:
-                    print(f"\n--- 已处理 {i} 条记录，暂停2秒 ---")
-                    time.sleep(2)
             
             # 提交更改
             if not dry_run and updated_count > 0:
@@ -198,6 +172,17 @@ class DirectorCastFixer:
             if not dry_run:
                 self.db.rollback()
 
+async def run_fixer(dry_run: bool, limit: Optional[int]):
+    # 确保本地影视目录等表已创建
+    init_database()
+    fixer = DirectorCastFixer()
+    
+    try:
+        await fixer.fix_all_records(dry_run=dry_run, limit=limit)
+    finally:
+        fixer.close()
+        await close_http_client()
+
 def main():
     if not TMDB_API_KEY:
         print("错误: 未找到 TMDB_API_KEY 环境变量")
@@ -218,12 +203,7 @@ def main():
     # 如果指定了 --apply，则关闭 dry_run
     dry_run = not args.apply
     
-    fixer = DirectorCastFixer()
-    
-    try:
-        fixer.fix_all_records(dry_run=dry_run, limit=args.limit)
-    finally:
-        fixer.close()
+    asyncio.run(run_fixer(dry_run=dry_run, limit=args.limit))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
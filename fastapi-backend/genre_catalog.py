@@ -0,0 +1,133 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+from tmdb_client import tmdb_get, TMDB_API_KEY, TMDB_BASE_URL
+from upstream_priority import upstream_priority, PREFETCH
+
+# 后台刷新间隔（秒）
+GENRE_REFRESH_INTERVAL = float(os.getenv("GENRE_REFRESH_INTERVAL", str(6 * 3600)))
+# 刷新失败后的重试间隔（秒）
+GENRE_RETRY_INTERVAL = float(os.getenv("GENRE_RETRY_INTERVAL", "60"))
+
+# TMDB 未返回或尚未加载时使用的中文题材名称
+DEFAULT_GENRE_NAMES = {
+    28: '动作', 12: '冒险', 16: '动画', 35: '喜剧', 80: '犯罪',
+    99: '纪录片', 18: '剧情', 10751: '家庭', 14: '奇幻', 36: '历史',
+    27: '恐怖', 10402: '音乐', 9648: '悬疑', 10749: '爱情', 878: '科幻',
+    10770: '电视电影', 53: '惊悚', 10752: '战争', 37: '西部', 10759: '动作冒险',
+    10762: '儿童', 10763: '新闻', 10764: '真人秀', 10765: '科幻奇幻', 10766: '肥皂剧',
+    10767: '脱口秀', 10768: '战争政治'
+}
+
+class GenreCatalog:
+    """电影和电视剧题材目录
+
+    启动时并发加载两份题材列表，之后在后台定期刷新；
+    /api/movies/genres 和 ID→名称的转换都直接读取内存中的索引。
+    刷新失败时继续使用上次加载的数据，并标记为 stale。
+    """
+
+    def __init__(self, refresh_interval: float = GENRE_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._genres: List[Dict] = []
+        self._names: Dict[int, str] = dict(DEFAULT_GENRE_NAMES)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def stale(self) -> bool:
+        """已加载过数据，但最近一次刷新失败"""
+        return self.loaded and self.last_error is not None
+
+    async def refresh(self, client: httpx.AsyncClient):
+        """从TMDB并发获取电影和电视剧题材并重建索引"""
+        async with self._lock:
+            params = {"api_key": TMDB_API_KEY, "language": "zh-CN"}
+            movie_data, tv_data = await asyncio.gather(
+                tmdb_get(client, f"{TMDB_BASE_URL}/genre/movie/list", params, force_refresh=True),
+                tmdb_get(client, f"{TMDB_BASE_URL}/genre/tv/list", params, force_refresh=True)
+            )
+
+            # 合并并去重
+            unique_genres = []
+            seen_ids = set()
+            for genre in movie_data.get("genres", []) + tv_data.get("genres", []):
+                if genre["id"] not in seen_ids:
+                    unique_genres.append(genre)
+                    seen_ids.add(genre["id"])
+
+            names = dict(DEFAULT_GENRE_NAMES)
+            names.update({genre["id"]: genre["name"] for genre in unique_genres if genre.get("name")})
+
+            # 整体替换，读取方不会看到更新到一半的索引
+            self._genres = unique_genres
+            self._names = names
+            self.loaded_at = datetime.now()
+            self.last_error = None
+
+    async def get_genres(self, client: httpx.AsyncClient) -> List[Dict]:
+        """返回合并去重后的题材列表，尚未加载时先加载"""
+        if not self.loaded:
+            await self.refresh(client)
+        return self._genres
+
+    def genres_by_ids(self, genre_ids: List[int]) -> List[Dict]:
+        """转换genre ID为名称对象"""
+        names = self._names
+        return [
+            {"id": genre_id, "name": names.get(genre_id, f"类型{genre_id}")}
+            for genre_id in genre_ids
+        ]
+
+    async def start(self, client: httpx.AsyncClient):
+        """首次加载并启动后台刷新任务，加载失败不影响启动"""
+        try:
+            await self.refresh(client)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"加载题材目录失败: {str(e)}")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self, client: httpx.AsyncClient):
+        while True:
+            # 上次刷新失败时提前重试，上游恢复后尽快替换过期数据
+            interval = self.refresh_interval if self.last_error is None else min(self.refresh_interval, GENRE_RETRY_INTERVAL)
+            await asyncio.sleep(interval)
+            try:
+                with upstream_priority(PREFETCH):
+                    await self.refresh(client)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"刷新题材目录失败: {str(e)}")
+
+    def status(self) -> Dict:
+        return {
+            "genres": len(self._genres),
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "refresh_interval": self.refresh_interval,
+            "stale": self.stale,
+            "last_error": self.last_error
+        }
+
+genre_catalog = GenreCatalog()
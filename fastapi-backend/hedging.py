@@ -0,0 +1,99 @@
+import math
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+
+class RequestHedger:
+    """上游请求对冲（hedged requests）的策略和统计
+
+    按接口类别记录最近的响应耗时；请求超过该类别的p95仍未完成时，
+    可以再发送一个相同的请求，使用先返回的结果。
+    对冲额度按普通请求数的固定比例累积（最多攒 max_burst 次），
+    保证对冲请求不超过总流量的 max_ratio。
+    """
+
+    def __init__(
+        self,
+        kinds: Iterable[str],
+        max_ratio: float = 0.05,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        max_burst: float = 10.0
+    ):
+        self.kinds = set(kinds)
+        self.max_ratio = max_ratio
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_burst = max_burst
+        self._latencies: Dict[str, Deque[float]] = {kind: deque(maxlen=window) for kind in self.kinds}
+        self._budget = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self.skipped_budget = 0
+        self.skipped_rate_limit = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.kinds) and self.max_ratio > 0
+
+    def _percentile(self, kind: str) -> Optional[float]:
+        samples = self._latencies.get(kind)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)]
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """该类别的请求多久未完成时发送对冲请求；不对冲或样本不足时返回None"""
+        if not self.enabled or kind not in self.kinds:
+            return None
+        self.requests += 1
+        self._budget = min(self.max_burst, self._budget + self.max_ratio)
+        percentile = self._percentile(kind)
+        if percentile is None:
+            return None
+        return max(percentile, self.min_delay)
+
+    def try_hedge(self, acquire_token: Callable[[], bool]) -> bool:
+        """是否发送对冲请求：需要有对冲额度，并且 acquire_token 能立即拿到限流令牌"""
+        if self._budget < 1:
+            self.skipped_budget += 1
+            return False
+        if not acquire_token():
+            self.skipped_rate_limit += 1
+            return False
+        self._budget -= 1
+        self.hedges += 1
+        return True
+
+    def record_latency(self, kind: str, seconds: float):
+        samples = self._latencies.get(kind)
+        if samples is not None:
+            samples.append(seconds)
+
+    def record_win(self):
+        """对冲请求先于原请求返回"""
+        self.wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "kinds": sorted(self.kinds),
+            "max_ratio": self.max_ratio,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            "win_rate": round(self.wins / self.hedges, 4) if self.hedges else 0.0,
+            "skipped_budget": self.skipped_budget,
+            "skipped_rate_limit": self.skipped_rate_limit,
+            "thresholds": {
+                kind: round(percentile, 3)
+                for kind in sorted(self.kinds)
+                if (percentile := self._percentile(kind)) is not None
+            }
+        }
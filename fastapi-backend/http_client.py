@@ -0,0 +1,77 @@
+import asyncio
+import importlib.util
+import os
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 上游连接池配置（可通过环境变量调整）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+# 启动时预热的上游地址（逗号分隔）
+HTTP_PREWARM_URLS = [
+    url.strip()
+    for url in os.getenv(
+        "HTTP_PREWARM_URLS",
+        "https://api.themoviedb.org/3,https://www.freetogame.com/api"
+    ).split(",")
+    if url.strip()
+]
+
+_client: Optional[httpx.AsyncClient] = None
+
+def http2_available() -> bool:
+    """HTTP/2 需要安装 h2（httpx[http2]），未安装时回退到 HTTP/1.1"""
+    return importlib.util.find_spec("h2") is not None
+
+def create_http_client() -> httpx.AsyncClient:
+    """创建共享的上游连接池客户端"""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    http2 = HTTP2_ENABLED and http2_available()
+    return httpx.AsyncClient(timeout=timeout, limits=limits, http2=http2)
+
+async def prewarm_connections(client: httpx.AsyncClient):
+    """预先建立到上游的连接（DNS + TCP + TLS），失败不影响启动"""
+    async def warm(url: str):
+        try:
+            await client.head(url, timeout=httpx.Timeout(5.0))
+        except Exception as e:
+            print(f"连接预热失败: {url}, {str(e)}")
+
+    await asyncio.gather(*(warm(url) for url in HTTP_PREWARM_URLS))
+
+async def init_http_client() -> httpx.AsyncClient:
+    """在应用启动时创建并预热连接池"""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    await prewarm_connections(_client)
+    return _client
+
+async def close_http_client():
+    """在应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """FastAPI依赖：返回应用级共享的上游客户端"""
+    global _client
+    if _client is None:
+        # 未经过lifespan启动（例如脚本中直接调用）时按需创建
+        _client = create_http_client()
+    return _client
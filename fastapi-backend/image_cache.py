@@ -0,0 +1,340 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import AbstractSet, Any, Dict, Optional, Set, Tuple
+
+import httpx
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow为可选依赖，未安装时不生成占位图
+    Image = None
+
+# 图片缓存目录和磁盘配额（字节），超出时按最近最少使用淘汰
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 单张图片的大小上限（字节）和上游请求超时（秒）
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "15"))
+# 最多跟随的重定向次数（每一跳都检查域名）
+IMAGE_MAX_REDIRECTS = 3
+# 同时向上游获取图片的数量
+IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "16"))
+# 占位缩略图的宽度（像素）
+IMAGE_PLACEHOLDER_WIDTH = 16
+
+class ImageFetchError(Exception):
+    """上游图片获取失败，status_code 为返回给客户端的状态码"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+class CachedImage:
+    __slots__ = ("source", "digest", "content_type", "placeholder")
+
+    def __init__(self, source: str, digest: str, content_type: str, placeholder: Optional[Dict] = None):
+        self.source = source
+        self.digest = digest
+        self.content_type = content_type
+        self.placeholder = placeholder
+
+def make_placeholder(body: bytes) -> Optional[Dict[str, str]]:
+    """主色和极小的模糊缩略图（data URI），图片加载前显示；未安装Pillow时返回None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            image = image.convert("RGB")
+            red, green, blue = image.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+            height = max(1, round(image.height * IMAGE_PLACEHOLDER_WIDTH / image.width))
+            thumbnail = image.resize((IMAGE_PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format="JPEG", quality=50)
+    except Exception as e:
+        print(f"生成占位图失败: {str(e)}")
+        return None
+    return {
+        "color": f"#{red:02x}{green:02x}{blue:02x}",
+        "thumbnail": "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    }
+
+class ImageCache:
+    """按内容寻址的本地图片缓存
+
+    图片文件以内容的SHA-256命名保存在 blobs/ 下，相同内容只保存一份；
+    refs/ 下的小文件记录上游地址到内容哈希的映射和占位图，重启后重新加载。
+    相同地址的并发请求只向上游获取一次，超出磁盘配额时按最近访问时间淘汰。
+    正在发送的图片文件持有租约，期间被淘汰时推迟到发送结束后再删除。
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._refs: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._blob_refs: Dict[str, int] = {}
+        self._blob_sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._leases: Dict[str, int] = {}
+        self._pending_deletes: Set[str] = set()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fetch_errors = 0
+
+    @staticmethod
+    def _ref_key(source: str) -> str:
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _ref_path(self, ref_key: str) -> str:
+        return os.path.join(self.directory, "refs", f"{ref_key}.json")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def _load(self):
+        """读取已有的缓存索引，按最近访问时间恢复LRU顺序"""
+        refs_dir = os.path.join(self.directory, "refs")
+        os.makedirs(refs_dir, exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+
+        entries = []
+        for name in os.listdir(refs_dir):
+            path = os.path.join(refs_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                blob_size = os.path.getsize(self.blob_path(data["digest"]))
+                entries.append((os.path.getmtime(path), name[:-len(".json")], data, blob_size))
+            except (OSError, ValueError, KeyError):
+                # 写到一半或图片文件已丢失的记录
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        for _, ref_key, data, blob_size in sorted(entries, key=lambda entry: entry[0]):
+            self._add(ref_key, CachedImage(data["source"], data["digest"], data["content_type"], data.get("placeholder")), blob_size)
+        self._evict()
+
+    async def start(self):
+        await asyncio.to_thread(self._load)
+        print(f"图片缓存已加载: {len(self._refs)} 张图片, {self._bytes} 字节")
+
+    def _add(self, ref_key: str, image: CachedImage, blob_size: int):
+        self._refs[ref_key] = image
+        # 等待删除的文件又被引用时保留
+        self._pending_deletes.discard(image.digest)
+        if image.digest not in self._blob_refs:
+            self._blob_refs[image.digest] = 0
+            self._blob_sizes[image.digest] = blob_size
+            self._bytes += blob_size
+        self._blob_refs[image.digest] += 1
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._refs:
+            ref_key, image = self._refs.popitem(last=False)
+            self.evictions += 1
+            try:
+                os.remove(self._ref_path(ref_key))
+            except OSError:
+                pass
+            self._blob_refs[image.digest] -= 1
+            if self._blob_refs[image.digest] == 0:
+                del self._blob_refs[image.digest]
+                self._bytes -= self._blob_sizes.pop(image.digest)
+                if self._leases.get(image.digest):
+                    self._pending_deletes.add(image.digest)
+                else:
+                    self._remove_blob(image.digest)
+
+    def _remove_blob(self, digest: str):
+        try:
+            os.remove(self.blob_path(digest))
+        except OSError:
+            pass
+
+    def _acquire(self, digest: str) -> bool:
+        """为仍在缓存中的图片文件加租约，文件已被淘汰时返回False"""
+        if digest not in self._blob_refs:
+            return False
+        self._leases[digest] = self._leases.get(digest, 0) + 1
+        return True
+
+    def release(self, digest: str):
+        """释放 get(lease=True) 取得的租约，发送期间被淘汰的文件在此删除"""
+        count = self._leases.get(digest, 0) - 1
+        if count > 0:
+            self._leases[digest] = count
+            return
+        self._leases.pop(digest, None)
+        if digest in self._pending_deletes:
+            self._pending_deletes.discard(digest)
+            self._remove_blob(digest)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """先写临时文件再改名，读取方不会看到写到一半的文件；临时文件名唯一，并发写入互不影响"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _store(self, ref_key: str, source: str, body: bytes, content_type: str) -> CachedImage:
+        """写入图片文件和映射记录（在线程中执行）"""
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self.blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            self._write_atomic(blob_path, body)
+
+        image = CachedImage(source, digest, content_type, make_placeholder(body))
+        self._write_atomic(self._ref_path(ref_key), json.dumps({
+            "source": source,
+            "digest": digest,
+            "content_type": content_type,
+            "placeholder": image.placeholder
+        }).encode("utf-8"))
+        return image
+
+    async def _download(
+        self,
+        client: httpx.AsyncClient,
+        source: str,
+        allowed_hosts: AbstractSet[str]
+    ) -> Tuple[bytes, str]:
+        """逐跳跟随重定向并下载图片，返回内容和类型
+
+        每一跳的协议和域名都必须在允许范围内，避免被重定向到内网等任意地址；
+        内容以流式读取，Content-Length 或已接收的字节数超过 IMAGE_MAX_BYTES 时立即中止。
+        """
+        url = httpx.URL(source)
+        for _ in range(IMAGE_MAX_REDIRECTS + 1):
+            if url.scheme not in ("http", "https") or url.host.lower() not in allowed_hosts:
+                raise ImageFetchError("不允许代理该图片地址", status_code=400)
+            async with client.stream("GET", url, timeout=IMAGE_FETCH_TIMEOUT, follow_redirects=False) as response:
+                if response.is_redirect:
+                    url = url.join(response.headers["location"])
+                    continue
+                if response.status_code == 404:
+                    raise ImageFetchError("图片不存在", status_code=404)
+                if response.status_code >= 400:
+                    raise ImageFetchError(f"获取图片失败: 上游返回 {response.status_code}")
+                content_type = response.headers.get("content-type", "").partition(";")[0].strip().lower()
+                if not content_type.startswith("image/") or content_type == "image/svg+xml":
+                    raise ImageFetchError("上游返回的不是图片")
+                content_length = response.headers.get("content-length", "")
+                if content_length.isdigit() and int(content_length) > IMAGE_MAX_BYTES:
+                    raise ImageFetchError("图片过大")
+
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > IMAGE_MAX_BYTES:
+                        raise ImageFetchError("图片过大")
+                    chunks.append(chunk)
+                return b"".join(chunks), content_type
+        raise ImageFetchError("获取图片失败: 重定向次数过多")
+
+    async def _fetch(self, client: httpx.AsyncClient, ref_key: str, source: str, allowed_hosts: AbstractSet[str]) -> CachedImage:
+        async with self._semaphore:
+            try:
+                body, content_type = await self._download(client, source, allowed_hosts)
+            except httpx.HTTPError as e:
+                raise ImageFetchError(f"获取图片失败: {str(e)}")
+
+        image = await asyncio.to_thread(self._store, ref_key, source, body, content_type)
+        if ref_key not in self._refs:
+            self._add(ref_key, image, len(body))
+            self._evict()
+        return image
+
+    def _on_fetch_done(self, ref_key: str, task: asyncio.Task):
+        self._inflight.pop(ref_key, None)
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def _touch(self, ref_key: str, digest: str) -> bool:
+        """确认图片文件仍然存在，并更新映射记录的修改时间（重启后按它恢复访问顺序）"""
+        if not os.path.exists(self.blob_path(digest)):
+            return False
+        try:
+            os.utime(self._ref_path(ref_key))
+        except OSError:
+            pass
+        return True
+
+    async def get(
+        self,
+        client: httpx.AsyncClient,
+        source: str,
+        allowed_hosts: AbstractSet[str],
+        lease: bool = False
+    ) -> CachedImage:
+        """返回缓存的图片，没有时从上游获取并保存；失败时抛出 ImageFetchError
+
+        allowed_hosts 为允许获取的域名（包括重定向之后的地址）。
+        lease 为True时返回前为图片文件加租约，发送完成后需要调用 release(image.digest)。
+        """
+        ref_key = self._ref_key(source)
+        image = self._refs.get(ref_key)
+        if image is not None and self._acquire(image.digest):
+            self._refs.move_to_end(ref_key)
+            if await asyncio.to_thread(self._touch, ref_key, image.digest):
+                self.hits += 1
+                if not lease:
+                    self.release(image.digest)
+                return image
+            # 文件被外部删除，重新获取
+            self.release(image.digest)
+
+        self.misses += 1
+        task = self._inflight.get(ref_key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(client, ref_key, source, allowed_hosts))
+            self._inflight[ref_key] = task
+            task.add_done_callback(lambda t: self._on_fetch_done(ref_key, t))
+        try:
+            # 单个请求取消时，不影响共享该次获取的其他请求
+            image = await asyncio.shield(task)
+        except ImageFetchError:
+            self.fetch_errors += 1
+            raise
+        if lease and not self._acquire(image.digest):
+            # 获取完成到返回之间已被淘汰（缓存配额过小）
+            raise ImageFetchError("图片缓存空间不足", status_code=503)
+        return image
+
+    def status(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "directory": os.path.abspath(self.directory),
+            "images": len(self._refs),
+            "files": len(self._blob_refs),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "fetch_errors": self.fetch_errors,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "placeholders": Image is not None
+        }
+
+image_cache = ImageCache()
@@ -0,0 +1,54 @@
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+from fastapi import Request
+
+from compression import choose_encoding
+from conditional import make_etag, representation_etag
+from models import LibraryVersion, MovieEdit, WatchStatus
+
+# 需要跟踪版本号的模型 -> 片单数据类别
+TRACKED_MODELS = {WatchStatus: "watch_status", MovieEdit: "movie_edits"}
+
+# 列表接口的响应格式变化时修改，使旧的ETag失效
+LIBRARY_ETAG_SCHEMA = "1"
+
+def _changed_libraries(session: Session) -> set:
+    changed = set()
+    dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in list(session.new) + list(session.deleted) + dirty:
+        kind = TRACKED_MODELS.get(type(obj))
+        if kind and obj.user_id is not None:
+            changed.add((obj.user_id, kind))
+    return changed
+
+@event.listens_for(Session, "after_flush")
+def _bump_library_versions(session: Session, flush_context):
+    """观看记录或电影编辑写入数据库时，在同一事务中递增对应用户的版本号
+
+    所有通过ORM的修改（接口、修复脚本）都会经过这里，事务回滚时版本号也一起回滚。
+    """
+    changes = _changed_libraries(session)
+    if not changes:
+        return
+
+    table = LibraryVersion.__table__
+    connection = session.connection()
+    for user_id, kind in changes:
+        result = connection.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.kind == kind)
+            .values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(user_id=user_id, kind=kind, version=1))
+
+def get_library_version(db: Session, user_id: int, kind: str) -> int:
+    row = db.get(LibraryVersion, (user_id, kind))
+    return row.version if row else 0
+
+def library_etag(request: Request, db: Session, user_id: int, kind: str) -> str:
+    """由用户的版本号和查询参数生成列表接口的ETag，不需要查询列表本身"""
+    version = get_library_version(db, user_id, kind)
+    etag = make_etag(kind, LIBRARY_ETAG_SCHEMA, user_id, version, request.url.query)
+    return representation_etag(etag, choose_encoding(request.headers.get("accept-encoding", "")))
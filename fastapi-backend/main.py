@@ -9,16 +9,39 @@ import os
 import logging
 
 from database import init_database
-from routers import movies, users, watch_status, movie_edits, games
+from http_client import init_http_client, close_http_client
+from genre_catalog import genre_catalog
+from media_type_index import media_type_index
+from title_catalog import catalog_stats
+from tmdb_client import upstream_stats, stop_revalidation
+from compression import CompressionMiddleware, response_cache_stats
+from cache_warmer import cache_warmer
+from title_refresher import title_refresher
+from image_cache import image_cache
+from routers import movies, users, watch_status, movie_edits, games, images
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时执行
     print("初始化数据库...")
     init_database()
+    await media_type_index.start()
+    await image_cache.start()
+    print("初始化上游连接池...")
+    client = await init_http_client()
+    print("加载题材目录...")
+    await genre_catalog.start(client)
+    cache_warmer.start(client)
+    title_refresher.start(client)
     print("后端启动完成")
     yield
-    # 关闭时执行（如果需要）
+    # 关闭时执行
+    await title_refresher.stop()
+    await cache_warmer.stop()
+    await genre_catalog.stop()
+    await media_type_index.stop()
+    await stop_revalidation()
+    await close_http_client()
     print("后端关闭")
 
 # 初始化FastAPI应用
@@ -39,6 +62,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（按Accept-Encoding协商brotli/gzip）
+app.add_middleware(CompressionMiddleware)
+
 
 # 静态文件服务暂时禁用
 # app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -72,6 +98,7 @@ app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(watch_status.router, prefix="/api/watch-status", tags=["watch-status"])
 app.include_router(movie_edits.router, prefix="/api/movie-edits", tags=["movie-edits"])
 app.include_router(games.router, prefix="/api/games", tags=["games"])
+app.include_router(images.router, prefix="/api/images", tags=["images"])
 
 # 管理员面板路由
 @app.get("/admin")
@@ -93,6 +120,20 @@ async def health_check():
         "version": "2.0.0 (FastAPI)"
     }
 
+# 上游访问统计
+@app.get("/api/health/upstream")
+async def upstream_health():
+    return {
+        **upstream_stats(),
+        "genre_catalog": genre_catalog.status(),
+        "media_type_index": media_type_index.status(),
+        "title_catalog": catalog_stats(),
+        "response_cache": response_cache_stats(),
+        "cache_warmer": cache_warmer.status(),
+        "title_refresher": title_refresher.status(),
+        "image_cache": image_cache.status()
+    }
+
 # 根路径
 @app.get("/")
 async def root():
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from database import SessionLocal
+from models import MediaTypeIndex as MediaTypeIndexModel, WatchStatus
+
+MEDIA_TYPES = ("movie", "tv")
+
+# 未找到的ID的负缓存时间（秒）
+MEDIA_TYPE_NEGATIVE_TTL = float(os.getenv("MEDIA_TYPE_NEGATIVE_TTL", "3600"))
+# 新学到的映射写入数据库的间隔（秒）
+MEDIA_TYPE_FLUSH_INTERVAL = float(os.getenv("MEDIA_TYPE_FLUSH_INTERVAL", "30"))
+
+class MediaTypeIndex:
+    """TMDB ID → 媒体类型的解析索引
+
+    数据来自用户观看记录和之前成功的详情查询，
+    内存中保存全部映射，新增的映射定期批量写入 media_type_index 表。
+    两种类型都不存在的ID会在内存中负缓存一段时间。
+    TMDB的电影和电视剧ID是两个会重复的编号空间，列表结果中出现的ID
+    不能说明该ID只属于这种类型，因此不从搜索/热门结果中学习。
+    """
+
+    def __init__(self, negative_ttl: float = MEDIA_TYPE_NEGATIVE_TTL, flush_interval: float = MEDIA_TYPE_FLUSH_INTERVAL):
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self._types: Dict[int, str] = {}
+        self._dirty: Dict[int, str] = {}
+        self._misses: Dict[int, float] = {}  # movie_id -> 负缓存过期时间
+        self._task: Optional[asyncio.Task] = None
+        self.negative_hits = 0
+
+    def load(self):
+        """从数据库加载已保存的映射和观看记录中的媒体类型"""
+        db = SessionLocal()
+        try:
+            for movie_id, media_type in db.query(MediaTypeIndexModel.movie_id, MediaTypeIndexModel.media_type):
+                self._types[movie_id] = media_type
+
+            # 用户保存的媒体类型优先于其他来源（已在观看记录中，无需再写入索引表）
+            watched = db.query(WatchStatus.movie_id, WatchStatus.media_type).filter(
+                WatchStatus.media_type.in_(MEDIA_TYPES)
+            ).distinct()
+            for movie_id, media_type in watched:
+                self._types[movie_id] = media_type
+        finally:
+            db.close()
+
+    def get(self, movie_id: int) -> Optional[str]:
+        return self._types.get(movie_id)
+
+    def learn(self, movie_id: int, media_type: Optional[str]):
+        """记录一个ID确认的媒体类型（详情查询成功或用户保存的观看记录）"""
+        if media_type not in MEDIA_TYPES:
+            return
+        self._misses.pop(movie_id, None)
+        if self._types.get(movie_id) != media_type:
+            self._types[movie_id] = media_type
+            self._dirty[movie_id] = media_type
+
+    def record_miss(self, movie_id: int):
+        self._misses[movie_id] = time.monotonic() + self.negative_ttl
+
+    def is_known_missing(self, movie_id: int) -> bool:
+        expires_at = self._misses.get(movie_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._misses[movie_id]
+            return False
+        self.negative_hits += 1
+        return True
+
+    def flush(self):
+        """将新学到的映射写入数据库"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            for movie_id, media_type in dirty.items():
+                db.merge(MediaTypeIndexModel(movie_id=movie_id, media_type=media_type, updated_at=now))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # 写入失败时保留待写入的数据，下次重试
+            for movie_id, media_type in dirty.items():
+                self._dirty.setdefault(movie_id, media_type)
+            print(f"保存媒体类型索引失败: {str(e)}")
+        finally:
+            db.close()
+
+    async def start(self):
+        try:
+            self.load()
+        except Exception as e:
+            print(f"加载媒体类型索引失败: {str(e)}")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def status(self) -> Dict:
+        return {
+            "entries": len(self._types),
+            "pending_writes": len(self._dirty),
+            "negative_entries": len(self._misses),
+            "negative_hits": self.negative_hits
+        }
+
+media_type_index = MediaTypeIndex()
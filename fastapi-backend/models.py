@@ -82,4 +82,32 @@ class MovieEdit(Base):
     user = relationship("User", back_populates="movie_edits")
     
     # 唯一约束
-    __table_args__ = (UniqueConstraint('user_id', 'movie_id', name='_user_movie_edit_uc'),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint('user_id', 'movie_id', name='_user_movie_edit_uc'),)
+
+class MediaTypeIndex(Base):
+    __tablename__ = "media_type_index"
+    
+    # TMDB ID -> 媒体类型（'movie' 或 'tv'），用于详情接口直接请求正确的端点
+    movie_id = Column(Integer, primary_key=True)
+    media_type = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Title(Base):
+    __tablename__ = "titles"
+    
+    # 本地影视目录：缓存TMDB的详情和演职人员信息，TMDB中电影和电视剧的ID可能重复
+    tmdb_id = Column(Integer, primary_key=True)
+    media_type = Column(String, primary_key=True)  # 'movie' or 'tv'
+    title = Column(String)
+    details = Column(Text)  # JSON
+    credits = Column(Text)  # JSON，只保留导演/主演等常用字段
+    details_fetched_at = Column(DateTime)
+    credits_fetched_at = Column(DateTime)
+
+class LibraryVersion(Base):
+    __tablename__ = "library_versions"
+    
+    # 用户片单数据的版本号：观看记录或电影编辑每次变化时递增，用于生成列表接口的ETag
+    user_id = Column(Integer, primary_key=True)
+    kind = Column(String, primary_key=True)  # 'watch_status' or 'movie_edits'
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,71 @@
+import re
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+# 字段投影：只返回前端用到的字段，减小响应体、JSON序列化时间和响应缓存占用
+
+# 无论选择哪些字段都保留
+ALWAYS_INCLUDED_FIELDS = ("id", "media_type", "stale")
+
+# 命名的字段配置
+FIELD_PROFILES = {
+    # 列表卡片（搜索、热门）以及标记观看状态时需要的字段
+    "card": (
+        "title", "name", "original_title", "original_name",
+        "poster_path", "backdrop_path", "overview",
+        "release_date", "first_air_date",
+        "vote_average", "vote_count",
+        "genre_ids", "genres", "origin_country", "production_countries",
+        "director", "cast"
+    ),
+}
+FIELD_PROFILES["detail"] = FIELD_PROFILES["card"] + (
+    "tagline", "status", "runtime", "episode_run_time",
+    "number_of_seasons", "number_of_episodes",
+    "original_language", "spoken_languages", "production_companies",
+    "created_by", "homepage", "imdb_id"
+)
+
+MAX_PROJECTION_FIELDS = 50
+FIELD_NAME_PATTERN = re.compile(r"^[a-z0-9_]+$")
+
+def parse_fields(fields: Optional[str]) -> Optional[frozenset]:
+    """解析 fields 参数，未传入时返回None（返回完整数据）
+
+    可以是配置名（card、detail）、逗号分隔的字段名，或两者混合，如 "card,tagline"。
+    """
+    if fields is None or not fields.strip():
+        return None
+
+    selected = set()
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name in FIELD_PROFILES:
+            selected.update(FIELD_PROFILES[name])
+        elif FIELD_NAME_PATTERN.match(name):
+            selected.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"无效的字段: {name}")
+
+    if len(selected) > MAX_PROJECTION_FIELDS:
+        raise HTTPException(status_code=400, detail="字段数量过多")
+    selected.update(ALWAYS_INCLUDED_FIELDS)
+    return frozenset(selected)
+
+def fields_key(projection: Optional[frozenset]) -> str:
+    """用于响应缓存键，相同的字段集合得到相同的键"""
+    return "all" if projection is None else ",".join(sorted(projection))
+
+def project(item: Dict, projection: Optional[frozenset]) -> Dict:
+    """只保留选择的字段，保持原有的字段顺序"""
+    if projection is None:
+        return item
+    return {key: value for key, value in item.items() if key in projection}
+
+def project_results(items: List[Dict], projection: Optional[frozenset]) -> List[Dict]:
+    if projection is None:
+        return items
+    return [project(item, projection) for item in items]
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from typing import Dict, Any, Sequence, Tuple
+
+
+class TokenBucket:
+    """异步令牌桶限流器
+
+    rate 为每秒补充的令牌数，capacity 为允许的突发量。
+    priorities 为按优先级从高到低排列的 (类别名, 保留令牌数)：
+    有更高优先级的请求在等待时，低优先级的请求不获取令牌；
+    低优先级的请求只在可用令牌多于保留数时获取，为高优先级留出突发额度。
+    同一类别内按先来先得的顺序获取；收到上游的 Retry-After 时可整体暂停。
+    """
+
+    def __init__(self, rate: float, capacity: float, priorities: Sequence[Tuple[str, float]] = (("default", 0.0),)):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._names = [name for name, _ in priorities]
+        # 保留数不超过 capacity - 1，低优先级最终总能拿到令牌
+        self._reserves = [min(max(reserve, 0.0), max(capacity - 1, 0.0)) for _, reserve in priorities]
+        self._locks = [asyncio.Lock() for _ in priorities]
+        self._waiting = [0 for _ in priorities]
+        self._acquired = [0 for _ in priorities]
+        self._waited = [0.0 for _ in priorities]
+        self._max_wait = [0.0 for _ in priorities]
+        self.pauses = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _higher_priority_waiting(self, priority: int) -> bool:
+        return any(self._waiting[:priority])
+
+    def _record(self, priority: int, waited: float):
+        self._acquired[priority] += 1
+        self._waited[priority] += waited
+        self._max_wait[priority] = max(self._max_wait[priority], waited)
+
+    async def acquire(self, priority: int = 0):
+        """按优先级获取一个令牌（0为最高），没有可用令牌时等待"""
+        started = time.monotonic()
+        self._waiting[priority] += 1
+        try:
+            async with self._locks[priority]:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+
+                    if self._higher_priority_waiting(priority):
+                        # 让更高优先级的请求先获取
+                        await asyncio.sleep(1 / self.rate)
+                        continue
+
+                    self._refill(now)
+                    needed = 1 + self._reserves[priority]
+                    if self._tokens >= needed:
+                        self._tokens -= 1
+                        break
+                    await asyncio.sleep((needed - self._tokens) / self.rate)
+        finally:
+            self._waiting[priority] -= 1
+
+        self._record(priority, time.monotonic() - started)
+
+    def try_acquire(self, priority: int = 0) -> bool:
+        """有可用令牌且没有同级或更高优先级的请求在等待时立即获取并返回True，否则直接返回False"""
+        if any(self._waiting[:priority + 1]) or self.available_tokens() < 1 + self._reserves[priority]:
+            return False
+        self._tokens -= 1
+        self._record(priority, 0.0)
+        return True
+
+    def available_tokens(self) -> float:
+        """当前可用的令牌数，暂停期间为0"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return 0.0
+        self._refill(now)
+        return self._tokens
+
+    def pause(self, seconds: float):
+        """在指定时间内暂停发放令牌（例如收到429时）"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self.pauses += 1
+
+    @property
+    def acquired(self) -> int:
+        return sum(self._acquired)
+
+    @property
+    def waited_seconds(self) -> float:
+        return sum(self._waited)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "available_tokens": round(self._tokens, 2),
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "pauses": self.pauses,
+            "priorities": {
+                name: {
+                    "reserved_tokens": self._reserves[index],
+                    "queue_depth": self._waiting[index],
+                    "acquired": self._acquired[index],
+                    "waited_seconds": round(self._waited[index], 3),
+                    "avg_wait": round(self._waited[index] / self._acquired[index], 4) if self._acquired[index] else 0.0,
+                    "max_wait": round(self._max_wait[index], 3)
+                }
+                for index, name in enumerate(self._names)
+            }
+        }
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 import httpx
+import os
 from typing import Optional, List, Dict, Any
 
+from cache import TTLCache
+from http_client import get_http_client
+from compression import cached_json_response, FastJSONResponse
+from conditional import CACHE_CONTROL_PUBLIC_SHORT
+
 router = APIRouter()
 
 FREETOGAME_BASE_URL = "https://www.freetogame.com/api"
 
+# FreeToGame完整游戏列表的缓存时间（秒），由缓存预热任务在过期前刷新
+FREETOGAME_CACHE_TTL = float(os.getenv("FREETOGAME_CACHE_TTL", str(30 * 60)))
+free_games_cache = TTLCache("freetogame", FREETOGAME_CACHE_TTL, max_entries=1, max_bytes=8 * 1024 * 1024)
+
 # 模拟热门游戏数据
 mock_popular_games = [
     {
@@ -130,57 +140,83 @@ mock_popular_games = [
     }
 ]
 
+async def refresh_free_games(client: httpx.AsyncClient) -> List[Dict]:
+    """获取FreeToGame的完整游戏列表并写入缓存，失败时抛出异常"""
+    response = await client.get(f"{FREETOGAME_BASE_URL}/games")
+    response.raise_for_status()
+    free_games_data = response.json()
+    
+    free_games = [
+        {
+            "id": game["id"] + 2000,  # 避免ID冲突
+            "name": game["title"],
+            "background_image": game["thumbnail"],
+            "rating": 4.0,
+            "rating_top": 5,
+            "ratings_count": 1000,
+            "released": game["release_date"],
+            "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
+            "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
+            "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
+            "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
+            "description_raw": game["short_description"],
+            "description": game["short_description"],
+            "metacritic": None,
+            "game_url": game["game_url"],
+            "freetogame_profile_url": game["freetogame_profile_url"],
+            "is_free": True
+        }
+        for game in free_games_data
+    ]
+    free_games_cache.set("games", free_games, size=len(response.content))
+    return free_games
+
+async def get_free_games(client: httpx.AsyncClient) -> List[Dict]:
+    """FreeToGame游戏列表，优先读取缓存；获取失败时使用过期缓存，没有缓存时返回空列表"""
+    free_games = free_games_cache.get("games")
+    if free_games is not None:
+        return free_games
+    try:
+        return await refresh_free_games(client)
+    except Exception as e:
+        stale = free_games_cache.get_stale("games")
+        if stale is not None:
+            print(f"FreeToGame API暂时不可用，使用过期缓存: {str(e)}")
+            return stale
+        print(f"FreeToGame API暂时不可用，使用模拟数据: {str(e)}")
+        return []
+
 @router.get("/popular")
-async def get_popular_games(page: int = Query(1, ge=1)):
+async def get_popular_games(
+    request: Request,
+    page: int = Query(1, ge=1),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """获取热门游戏"""
     try:
-        all_games = mock_popular_games.copy()
+        async def build():
+            all_games = mock_popular_games.copy()
+            
+            # 添加FreeToGame的免费游戏数据（不可用时只有模拟数据）
+            all_games.extend(await get_free_games(client))
+            
+            # 手动分页
+            page_size = 20
+            start_index = (page - 1) * page_size
+            end_index = start_index + page_size
+            games = all_games[start_index:end_index]
+            
+            return {
+                "count": len(all_games),
+                "results": games
+            }
         
-        # 尝试获取FreeToGame的免费游戏数据
-        try:
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(f"{FREETOGAME_BASE_URL}/games")
-                response.raise_for_status()
-                free_games_data = response.json()
-                
-                free_games = [
-                    {
-                        "id": game["id"] + 2000,  # 避免ID冲突
-                        "name": game["title"],
-                        "background_image": game["thumbnail"],
-                        "rating": 4.0,
-                        "rating_top": 5,
-                        "ratings_count": 1000,
-                        "released": game["release_date"],
-                        "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
-                        "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
-                        "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
-                        "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
-                        "description_raw": game["short_description"],
-                        "description": game["short_description"],
-                        "metacritic": None,
-                        "game_url": game["game_url"],
-                        "freetogame_profile_url": game["freetogame_profile_url"],
-                        "is_free": True
-                    }
-                    for game in free_games_data
-                ]
-                
-                all_games.extend(free_games)
-        except Exception as e:
-            print(f"FreeToGame API暂时不可用，使用模拟数据: {str(e)}")
-        
-        # 手动分页
-        page_size = 20
-        start_index = (page - 1) * page_size
-        end_index = start_index + page_size
-        games = all_games[start_index:end_index]
-        
-        return {
-            "count": len(all_games),
-            "results": games
-        }
+        # 缓存序列化和压缩后的响应体；FreeToGame不可用（只有模拟数据）时不缓存
+        return await cached_json_response(
+            request, f"games:popular:{page}", build,
+            cacheable=lambda data: data["count"] > len(mock_popular_games),
+            cache_control=CACHE_CONTROL_PUBLIC_SHORT
+        )
         
     except Exception as e:
         print(f"获取热门游戏失败: {str(e)}")
@@ -191,7 +227,8 @@ async def search_games(
     search: Optional[str] = None,
     genres: Optional[str] = None,
     platforms: Optional[str] = None,
-    page: int = Query(1, ge=1)
+    page: int = Query(1, ge=1),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """搜索游戏"""
     try:
@@ -199,42 +236,40 @@ async def search_games(
         
         # 添加FreeToGame数据
         try:
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                url = f"{FREETOGAME_BASE_URL}/games"
-                
-                # 如果有特定的类型或平台筛选，使用对应的API
-                if genres and genres not in ['action-rpg', 'action-adventure']:
-                    url = f"{FREETOGAME_BASE_URL}/games?category={genres}"
-                elif platforms and platforms in ['pc', 'web-browser']:
-                    url = f"{FREETOGAME_BASE_URL}/games?platform={platforms}"
-                
-                response = await client.get(url)
-                response.raise_for_status()
-                free_games_data = response.json()
-                
-                free_games = [
-                    {
-                        "id": game["id"] + 2000,
-                        "name": game["title"],
-                        "background_image": game["thumbnail"],
-                        "rating": 4.0,
-                        "rating_top": 5,
-                        "ratings_count": 1000,
-                        "released": game["release_date"],
-                        "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
-                        "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
-                        "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
-                        "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
-                        "description_raw": game["short_description"],
-                        "description": game["short_description"],
-                        "metacritic": None,
-                        "is_free": True
-                    }
-                    for game in free_games_data
-                ]
-                
-                all_games.extend(free_games)
+            url = f"{FREETOGAME_BASE_URL}/games"
+            
+            # 如果有特定的类型或平台筛选，使用对应的API
+            if genres and genres not in ['action-rpg', 'action-adventure']:
+                url = f"{FREETOGAME_BASE_URL}/games?category={genres}"
+            elif platforms and platforms in ['pc', 'web-browser']:
+                url = f"{FREETOGAME_BASE_URL}/games?platform={platforms}"
+            
+            response = await client.get(url)
+            response.raise_for_status()
+            free_games_data = response.json()
+            
+            free_games = [
+                {
+                    "id": game["id"] + 2000,
+                    "name": game["title"],
+                    "background_image": game["thumbnail"],
+                    "rating": 4.0,
+                    "rating_top": 5,
+                    "ratings_count": 1000,
+                    "released": game["release_date"],
+                    "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
+                    "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
+                    "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
+                    "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
+                    "description_raw": game["short_description"],
+                    "description": game["short_description"],
+                    "metacritic": None,
+                    "is_free": True
+                }
+                for game in free_games_data
+            ]
+            
+            all_games.extend(free_games)
         except Exception as e:
             print(f"FreeToGame搜索失败，仅使用模拟数据: {str(e)}")
         
@@ -273,10 +308,10 @@ async def search_games(
         end_index = start_index + page_size
         paginated_games = filtered_games[start_index:end_index]
         
-        return {
+        return FastJSONResponse({
             "count": len(filtered_games),
             "results": paginated_games
-        }
+        })
         
     except Exception as e:
         print(f"搜索游戏失败: {str(e)}")
@@ -314,7 +349,7 @@ async def get_game_genres():
         raise HTTPException(status_code=500, detail="获取游戏类型失败")
 
 @router.get("/{game_id}")
-async def get_game_detail(game_id: int):
+async def get_game_detail(game_id: int, client: httpx.AsyncClient = Depends(get_http_client)):
     """获取单个游戏详情"""
     try:
         # 先从模拟数据中查找
@@ -325,32 +360,30 @@ async def get_game_detail(game_id: int):
         # 如果是FreeToGame的游戏ID，从API获取
         if game_id > 2000:
             original_id = game_id - 2000
-            timeout = httpx.Timeout(30.0, connect=10.0)
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(f"{FREETOGAME_BASE_URL}/game?id={original_id}")
-                response.raise_for_status()
-                game = response.json()
-                
-                result = {
-                    "id": game_id,
-                    "name": game["title"],
-                    "background_image": game["thumbnail"],
-                    "rating": 4.0,
-                    "rating_top": 5,
-                    "ratings_count": 1000,
-                    "released": game["release_date"],
-                    "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
-                    "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
-                    "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
-                    "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
-                    "description_raw": game.get("description") or game["short_description"],
-                    "description": game.get("description") or game["short_description"],
-                    "metacritic": None,
-                    "screenshots": game.get("screenshots", []),
-                    "is_free": True
-                }
-                
-                return result
+            response = await client.get(f"{FREETOGAME_BASE_URL}/game?id={original_id}")
+            response.raise_for_status()
+            game = response.json()
+            
+            result = {
+                "id": game_id,
+                "name": game["title"],
+                "background_image": game["thumbnail"],
+                "rating": 4.0,
+                "rating_top": 5,
+                "ratings_count": 1000,
+                "released": game["release_date"],
+                "genres": [{"id": 1, "name": game["genre"], "slug": game["genre"].lower()}],
+                "platforms": [{"platform": {"id": 1, "name": game["platform"], "slug": game["platform"].lower()}}],
+                "developers": [{"id": 1, "name": game["developer"], "slug": game["developer"].lower()}],
+                "publishers": [{"id": 1, "name": game["publisher"], "slug": game["publisher"].lower()}],
+                "description_raw": game.get("description") or game["short_description"],
+                "description": game.get("description") or game["short_description"],
+                "metacritic": None,
+                "screenshots": game.get("screenshots", []),
+                "is_free": True
+            }
+            
+            return result
         
         raise HTTPException(status_code=404, detail="游戏未找到")
         
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import FileResponse
+import httpx
+import os
+import re
+
+from http_client import get_http_client
+from image_cache import image_cache, ImageFetchError, CachedImage
+from conditional import make_etag, etag_matches, not_modified
+
+router = APIRouter()
+
+TMDB_IMAGE_HOST = "image.tmdb.org"
+TMDB_IMAGE_BASE_URL = f"https://{TMDB_IMAGE_HOST}/t/p"
+# 允许代理的TMDB图片尺寸
+TMDB_IMAGE_SIZES = {"w92", "w154", "w185", "w300", "w342", "w500", "w780", "w1280", "original"}
+TMDB_IMAGE_PATH_PATTERN = re.compile(r"^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$")
+# 占位图使用的最小尺寸
+PLACEHOLDER_SOURCE_SIZE = "w92"
+
+# 允许代理的外部图片域名（游戏封面等）
+IMAGE_PROXY_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("IMAGE_PROXY_HOSTS", "www.freetogame.com,images.igdb.com").split(",")
+    if host.strip()
+}
+
+# 缓存的图片内容不会改变（按内容寻址），浏览器可以长期缓存
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def tmdb_image_url(size: str, path: str) -> str:
+    if size not in TMDB_IMAGE_SIZES:
+        raise HTTPException(status_code=400, detail="不支持的图片尺寸")
+    if not TMDB_IMAGE_PATH_PATTERN.match(path):
+        raise HTTPException(status_code=400, detail="无效的图片路径")
+    return f"{TMDB_IMAGE_BASE_URL}/{size}/{path}"
+
+class CachedImageResponse(FileResponse):
+    """发送缓存的图片文件，结束（包括客户端中断）后释放文件租约"""
+
+    def __init__(self, image: CachedImage, headers: dict):
+        super().__init__(image_cache.blob_path(image.digest), media_type=image.content_type, headers=headers)
+        self.digest = image.digest
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            image_cache.release(self.digest)
+
+async def load_image(client: httpx.AsyncClient, source: str, allowed_hosts: set, lease: bool = False) -> CachedImage:
+    try:
+        return await image_cache.get(client, source, allowed_hosts, lease=lease)
+    except ImageFetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def image_response(request: Request, image: CachedImage):
+    """image 需要以 lease=True 获取，发送期间文件不会被缓存淘汰删除"""
+    etag = make_etag(image.digest)
+    headers = {}
+    if image.placeholder:
+        headers["X-Placeholder-Color"] = image.placeholder["color"]
+    if etag_matches(request, etag):
+        image_cache.release(image.digest)
+        return not_modified(etag, IMAGE_CACHE_CONTROL, headers)
+    headers["ETag"] = etag
+    headers["Cache-Control"] = IMAGE_CACHE_CONTROL
+    return CachedImageResponse(image, headers)
+
+@router.get("/external")
+async def get_external_image(
+    request: Request,
+    url: str,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """代理允许的外部图片（游戏封面等）"""
+    try:
+        parsed = httpx.URL(url)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的图片地址")
+    if parsed.scheme not in ("http", "https") or parsed.host.lower() not in IMAGE_PROXY_HOSTS:
+        raise HTTPException(status_code=400, detail="不允许代理该图片地址")
+
+    return image_response(request, await load_image(client, str(parsed), IMAGE_PROXY_HOSTS, lease=True))
+
+@router.get("/placeholder/{path}")
+async def get_image_placeholder(
+    path: str,
+    response: Response,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """TMDB图片的占位信息：主色和极小的缩略图（需要安装Pillow）"""
+    image = await load_image(client, tmdb_image_url(PLACEHOLDER_SOURCE_SIZE, path), {TMDB_IMAGE_HOST})
+    if not image.placeholder:
+        raise HTTPException(status_code=404, detail="占位图不可用")
+    response.headers["Cache-Control"] = IMAGE_CACHE_CONTROL
+    return image.placeholder
+
+@router.get("/{size}/{path}")
+async def get_tmdb_image(
+    request: Request,
+    size: str,
+    path: str,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """代理TMDB图片，首次请求时获取并保存到本地缓存"""
+    return image_response(request, await load_image(client, tmdb_image_url(size, path), {TMDB_IMAGE_HOST}, lease=True))
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import Optional, List
@@ -7,6 +7,8 @@ from database import get_db
 from models import User, MovieEdit
 from schemas import MovieEditCreate, MovieEditUpdate, MovieEdit as MovieEditSchema
 from auth import get_current_user
+from library_version import library_etag
+from conditional import etag_matches, not_modified, CACHE_CONTROL_PRIVATE
 
 router = APIRouter()
 
@@ -82,13 +84,24 @@ async def get_movie_edit(
 
 @router.get("/", response_model=List[MovieEditSchema])
 async def get_movie_edits_list(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取用户的所有电影编辑"""
+    """获取用户的所有电影编辑
+
+    ETag由用户电影编辑的版本号生成，未变化时直接返回304，不查询列表。
+    """
     try:
+        etag = library_etag(request, db, current_user.id, "movie_edits")
+        if etag_matches(request, etag):
+            return not_modified(etag, CACHE_CONTROL_PRIVATE)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL_PRIVATE
+        
         movie_edits = db.query(MovieEdit).filter(
             MovieEdit.user_id == current_user.id
         ).order_by(MovieEdit.updated_at.desc()).offset((page - 1) * limit).limit(limit).all()
@@ -1,5 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import math
 import os
 from dotenv import load_dotenv
 from typing import Optional, Dict, Any, List
@@ -8,6 +16,16 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import WatchStatus, User
 from auth import get_current_user_optional
+from http_client import get_http_client
+from tmdb_client import tmdb_get, make_cache_key
+from genre_catalog import genre_catalog
+from media_type_index import media_type_index, MEDIA_TYPES
+from title_catalog import get_title_details, get_title_credits
+from compression import cached_json_response, render_json, FastJSONResponse
+from conditional import CACHE_CONTROL_PUBLIC_SHORT, CACHE_CONTROL_PUBLIC_LONG
+from projection import parse_fields, fields_key, project, project_results
+from deadline import Deadline, DeadlineExceeded, detach
+from upstream_priority import upstream_priority, PREFETCH
 
 load_dotenv()
 
@@ -17,6 +35,22 @@ API_KEY = os.getenv("TMDB_API_KEY", "be3849411a172c7f817c762b765ec656")
 BASE_URL = "https://api.themoviedb.org/3"
 IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
 
+# 特殊类型搜索时并发获取详情的最大并发数
+SEARCH_DETAIL_CONCURRENCY = int(os.getenv("SEARCH_DETAIL_CONCURRENCY", "8"))
+# withCredits=true 时并发获取演职人员信息的最大并发数
+CREDITS_CONCURRENCY = int(os.getenv("CREDITS_CONCURRENCY", "8"))
+
+# 排除已标记电影时并发预取页数：首轮页数和每轮上限
+EXCLUDE_MARKED_INITIAL_PARALLEL_PAGES = int(os.getenv("EXCLUDE_MARKED_INITIAL_PARALLEL_PAGES", "2"))
+EXCLUDE_MARKED_MAX_PARALLEL_PAGES = int(os.getenv("EXCLUDE_MARKED_MAX_PARALLEL_PAGES", "4"))
+
+# 单次搜索的时间预算（秒），用完时返回已有的结果和续查游标；0表示不限制
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "2"))
+
+# 搜索响应发出后预取：前几个结果的详情（0表示不预取）、下一页的TMDB结果
+SEARCH_PREFETCH_TOP_K = int(os.getenv("SEARCH_PREFETCH_TOP_K", "5"))
+SEARCH_PREFETCH_NEXT_PAGE = os.getenv("SEARCH_PREFETCH_NEXT_PAGE", "true").lower() == "true"
+
 # 国家名中文映射
 country_name_map = {
     'United States of America': '美国',
@@ -90,9 +124,7 @@ def get_country_name_by_code(code: str) -> str:
 async def get_credits_info(client: httpx.AsyncClient, movie_id: int, media_type: str) -> tuple:
     """获取电影/电视剧的演职人员信息"""
     try:
-        credits_url = f"{BASE_URL}/{media_type}/{movie_id}/credits"
-        credits_response = await client.get(credits_url, params={"api_key": API_KEY, "language": "zh-CN"})
-        credits_data = credits_response.json()
+        credits_data = await get_title_credits(client, movie_id, media_type)
         
         # 获取导演信息
         director = ""
@@ -117,21 +149,77 @@ async def get_credits_info(client: httpx.AsyncClient, movie_id: int, media_type:
         print(f"获取演职人员信息失败: {movie_id}, {e}")
         return "", ""
 
+def result_media_type(movie: Dict) -> str:
+    """列表结果的媒体类型：优先使用结果中的media_type，否则按title/name判断"""
+    if movie.get("media_type") in MEDIA_TYPES:
+        return movie["media_type"]
+    return "tv" if (not movie.get("title") and movie.get("name")) else "movie"
+
+async def attach_credits(
+    client: httpx.AsyncClient,
+    movies: List[Dict],
+    deadline: Optional[Deadline] = None
+) -> List[Dict]:
+    """并发获取每个结果的导演和主演，附加 director 和 cast 字段
+
+    演职人员信息来自影视目录（本地数据库和TMDB缓存），并发数受 CREDITS_CONCURRENCY 限制。
+    时间预算用完时，未完成的结果不附加这两个字段，请求在后台继续完成并写入缓存。
+    """
+    deadline = deadline or Deadline()
+    semaphore = asyncio.Semaphore(CREDITS_CONCURRENCY)
+    
+    async def fetch_credits(movie: Dict) -> tuple:
+        async with semaphore:
+            return await get_credits_info(client, movie["id"], result_media_type(movie))
+    
+    tasks = [asyncio.ensure_future(fetch_credits(movie)) for movie in movies]
+    if not tasks:
+        return []
+    try:
+        await deadline.wait(asyncio.gather(*tasks))
+    except DeadlineExceeded:
+        for task in tasks:
+            if not task.done():
+                detach(task)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    enriched = []
+    for movie, task in zip(movies, tasks):
+        if task.done():
+            director, cast = task.result()
+            movie = {**movie, "director": director, "cast": cast}
+        enriched.append(movie)
+    return enriched
+
 def get_genres_by_ids(genre_ids: List[int]) -> List[Dict]:
     """转换genre ID为名称对象"""
-    genre_map = {
-        28: '动作', 12: '冒险', 16: '动画', 35: '喜剧', 80: '犯罪', 
-        99: '纪录片', 18: '剧情', 10751: '家庭', 14: '奇幻', 36: '历史',
-        27: '恐怖', 10402: '音乐', 9648: '悬疑', 10749: '爱情', 878: '科幻',
-        10770: '电视电影', 53: '惊悚', 10752: '战争', 37: '西部', 10759: '动作冒险',
-        10762: '儿童', 10763: '新闻', 10764: '真人秀', 10765: '科幻奇幻', 10766: '肥皂剧',
-        10767: '脱口秀', 10768: '战争政治'
-    }
-    
-    return [
-        {"id": genre_id, "name": genre_map.get(genre_id, f"类型{genre_id}")}
-        for genre_id in genre_ids
-    ]
+    return genre_catalog.genres_by_ids(genre_ids)
+
+async def fetch_movie_with_detail_genres(
+    client: httpx.AsyncClient,
+    movie: Dict,
+    semaphore: asyncio.Semaphore
+) -> Dict:
+    """获取单个结果的详情以得到完整题材，失败时回退到genre_ids"""
+    try:
+        detail_url = f"{BASE_URL}/{result_media_type(movie)}/{movie['id']}"
+        
+        async with semaphore:
+            detail_data = await tmdb_get(client, detail_url, {"api_key": API_KEY, "language": "zh-CN"})
+        
+        return {
+            **movie,
+            "genres": detail_data.get("genres", movie.get("genre_ids", []))
+        }
+    except Exception as e:
+        print(f"获取电影详情失败: {movie['id']}", str(e))
+        return {
+            **movie,
+            "genres": get_genres_by_ids(movie.get("genre_ids", []))
+        }
 
 async def get_user_marked_movie_ids(user_id: int, db: Session) -> set:
     """获取用户已标记的电影ID集合"""
@@ -142,51 +230,539 @@ async def get_user_marked_movie_ids(user_id: int, db: Session) -> set:
         print(f"获取用户标记电影失败: {str(e)}")
         return set()
 
-async def fetch_movies_until_enough(
+def search_fingerprint(url: str, params: dict) -> str:
+    """搜索条件的指纹（不含页码），用于校验游标是否属于同一组条件"""
+    key = make_cache_key(url, {k: v for k, v in params.items() if k != "page"})
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+def encode_cursor(position: tuple, fingerprint: str) -> str:
+    """把 (TMDB页码, 页内偏移) 编码为不透明的游标字符串"""
+    page, offset = position
+    raw = json.dumps({"p": page, "o": offset, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> tuple:
+    """解析游标，返回 (TMDB页码, 页内偏移)；游标无效或与搜索条件不符时抛出400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        page, offset = int(data["p"]), int(data["o"])
+        valid = data.get("f") == fingerprint and 1 <= page <= 500 and offset >= 0
+    except (ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return page, offset
+
+async def iter_unmarked_pages(
     client: httpx.AsyncClient,
     url: str,
     params: dict,
     target_count: int,
     marked_ids: set,
-    max_pages: int = 10
-) -> tuple:
-    """持续获取电影数据直到收集到足够的未标记电影"""
-    all_movies = []
+    progress: dict,
+    max_pages: int = 10,
+    max_parallel: int = EXCLUDE_MARKED_MAX_PARALLEL_PAGES,
+    start_offset: int = 0,
+    deadline: Optional[Deadline] = None
+):
+    """逐页产出未标记的电影，直到累计收集到 target_count 部
+
+    从 params["page"] 页的第 start_offset 条开始。每一轮并发请求后续的若干页，
+    页数根据已观察到的未标记比例自适应调整；收集够之后取消仍在进行中的请求。
+    每页的结果按页码顺序产出，遍历进度写入 progress：
+    total_pages、total_results、stale（是否包含过期缓存数据）和
+    next_position（下次继续的 (TMDB页码, 页内偏移)，没有更多结果时为None）、
+    batch_positions（本次产出的每部电影的位置）和 partial（是否因时间预算用完提前结束）。
+    时间预算用完时，已发出的请求在后台继续完成，续查时可以直接命中缓存。
+    """
+    deadline = deadline or Deadline()
+    collected = 0
     current_page = params.get("page", 1)
-    total_pages = 1
-    total_results = 0
+    last_page = min(current_page + max_pages, 501) - 1  # TMDB最大500页
+    progress.update(total_pages=1, total_results=0, stale=False, next_position=None, batch_positions=[], partial=False)
+    
+    # 用于估算每页能得到多少未标记电影
+    seen_count = 0
+    unmarked_count = 0
+    pages_done = 0
     
-    for page_num in range(current_page, min(current_page + max_pages, 501)):  # TMDB最大500页
-        params["page"] = page_num
+    next_page = current_page
+    batch_size = min(EXCLUDE_MARKED_INITIAL_PARALLEL_PAGES, max_parallel)
+    finished = False
+    keep_running = False
+    
+    while not finished and next_page <= last_page:
+        if pages_done:
+            # 已知总页数后不再请求不存在的页
+            last_page = min(last_page, progress["total_pages"])
+            if next_page > last_page:
+                break
+            
+            needed = target_count - collected
+            per_page = max(seen_count / pages_done, 1)
+            expected_unmarked = per_page * unmarked_count / seen_count if seen_count else 0
+            if expected_unmarked > 0:
+                batch_size = math.ceil(needed / expected_unmarked)
+            else:
+                batch_size = max_parallel
+            batch_size = max(1, min(batch_size, max_parallel))
+        
+        page_nums = list(range(next_page, min(next_page + batch_size, last_page + 1)))
+        next_page = page_nums[-1] + 1
+        tasks = [
+            asyncio.ensure_future(tmdb_get(client, url, {**params, "page": page_num}))
+            for page_num in page_nums
+        ]
         
         try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            # 更新总页数和总结果数（只在第一次获取时）
-            if page_num == current_page:
-                total_pages = data.get("total_pages", 1)
-                total_results = data.get("total_results", 0)
-            
-            movies = data.get("results", [])
-            
-            # 过滤掉已标记的电影
-            unmarked_movies = [movie for movie in movies if movie["id"] not in marked_ids]
-            all_movies.extend(unmarked_movies)
-            
-            # 如果收集到足够的电影，或者没有更多页面，停止
-            if len(all_movies) >= target_count or page_num >= total_pages:
-                break
+            for page_num, task in zip(page_nums, tasks):
+                start = start_offset if page_num == current_page else 0
+                try:
+                    data = await deadline.wait(task)
+                except DeadlineExceeded:
+                    progress["next_position"] = (page_num, start)
+                    progress["partial"] = True
+                    keep_running = True
+                    finished = True
+                    break
+                except Exception as e:
+                    print(f"获取第{page_num}页电影失败: {str(e)}")
+                    # 下次从失败的页重新开始
+                    progress["next_position"] = (page_num, 0)
+                    finished = True
+                    break
+                
+                progress["stale"] = progress["stale"] or bool(data.get("stale"))
+                
+                # 更新总页数和总结果数（只在第一次获取时）
+                if page_num == current_page:
+                    progress["total_pages"] = data.get("total_pages", 1)
+                    progress["total_results"] = data.get("total_results", 0)
+                total_pages = progress["total_pages"]
+                
+                movies = data.get("results", [])
+                
+                # 过滤掉已标记的电影，收集够时记录停在页内的位置
+                unmarked_movies = []
+                positions = []
+                index = start
+                while index < len(movies) and collected + len(unmarked_movies) < target_count:
+                    if movies[index]["id"] not in marked_ids:
+                        unmarked_movies.append(movies[index])
+                        positions.append((page_num, index))
+                    index += 1
+                
+                collected += len(unmarked_movies)
+                seen_count += index - start
+                unmarked_count += len(unmarked_movies)
+                pages_done += 1
                 
+                if index < len(movies):
+                    progress["next_position"] = (page_num, index)
+                elif page_num < min(total_pages, 500):
+                    progress["next_position"] = (page_num + 1, 0)
+                else:
+                    progress["next_position"] = None
+                
+                if unmarked_movies:
+                    progress["batch_positions"] = positions
+                    yield unmarked_movies
+                
+                # 如果收集到足够的电影，或者没有更多页面，停止
+                if collected >= target_count or page_num >= total_pages:
+                    finished = True
+                    break
+        finally:
+            # 取消本轮中已经不需要的预取请求；超出时间预算的请求留在后台完成
+            for task in tasks:
+                if not task.done():
+                    if keep_running:
+                        detach(task)
+                    else:
+                        task.cancel()
+
+def build_search_request(
+    query: Optional[str],
+    mediaType: str,
+    genre: Optional[str],
+    year: Optional[str],
+    region: Optional[str],
+    sortBy: str,
+    page: int
+) -> tuple:
+    """根据搜索条件确定TMDB接口和参数，返回 (url, params)"""
+    params = {
+        "api_key": API_KEY,
+        "language": "zh-CN",
+        "page": page,
+        "include_adult": False
+    }
+
+    if query and query.strip():
+        # 搜索模式
+        base_media_type = mediaType
+        
+        # 处理特殊类型的搜索
+        if mediaType == "animation":
+            base_media_type = "movie"
+        elif mediaType == "anime":
+            base_media_type = "tv"
+        elif mediaType == "documentary":
+            base_media_type = "movie"
+        elif mediaType == "variety":
+            base_media_type = "tv"
+        elif mediaType == "live_action_movie":
+            base_media_type = "movie"
+        elif mediaType == "live_action_tv":
+            base_media_type = "tv"
+        
+        if base_media_type == "all":
+            url = f"{BASE_URL}/search/multi"
+        else:
+            url = f"{BASE_URL}/search/{base_media_type}"
+        
+        params["query"] = query.strip()
+    else:
+        # 发现模式
+        base_media_type = mediaType
+        genre_filter = genre
+        
+        # 处理特殊类型
+        if mediaType == "animation":
+            base_media_type = "movie"
+            genre_filter = f"16,{genre_filter}" if genre_filter else "16"
+        elif mediaType == "anime":
+            base_media_type = "tv"
+            genre_filter = f"16,{genre_filter}" if genre_filter else "16"
+        elif mediaType == "documentary":
+            base_media_type = "movie"
+            genre_filter = f"99,{genre_filter}" if genre_filter else "99"
+        elif mediaType == "variety":
+            base_media_type = "tv"
+            genre_filter = f"10767,10764,{genre_filter}" if genre_filter else "10767,10764"
+        elif mediaType == "live_action_movie":
+            base_media_type = "movie"
+            # 真人电影：不包含动画类型(16)
+        elif mediaType == "live_action_tv":
+            base_media_type = "tv"
+            # 真人电视剧：不包含动画类型(16)
+        
+        if base_media_type == "tv" or mediaType in ["anime", "variety", "live_action_tv"]:
+            url = f"{BASE_URL}/discover/tv"
+            params["sort_by"] = sortBy
+            if year:
+                if year == "before_1960":
+                    params["first_air_date.lte"] = "1959-12-31"
+                elif "-" in year:  # 年代范围
+                    start_year, end_year = year.split("-")
+                    params["first_air_date.gte"] = f"{start_year}-01-01"
+                    params["first_air_date.lte"] = f"{end_year}-12-31"
+                else:
+                    params["first_air_date_year"] = year
+        else:
+            url = f"{BASE_URL}/discover/movie"
+            params["sort_by"] = sortBy
+            if year:
+                if year == "before_1960":
+                    params["primary_release_date.lte"] = "1959-12-31"
+                elif "-" in year:  # 年代范围
+                    start_year, end_year = year.split("-")
+                    params["primary_release_date.gte"] = f"{start_year}-01-01"
+                    params["primary_release_date.lte"] = f"{end_year}-12-31"
+                else:
+                    params["primary_release_year"] = year
+        
+        if genre_filter:
+            params["with_genres"] = genre_filter
+        
+        # 处理地区筛选
+        if region:
+            if region == "OTHER":
+                params["without_origin_country"] = "CN,HK,TW,US,KR,JP,FR,IT,GB,DE,IN,TH"
+            else:
+                params["with_origin_country"] = region
+
+    return url, params
+
+# 搜索模式下需要获取详情来判断题材的特殊类型
+SPECIAL_MEDIA_TYPES = ["animation", "anime", "documentary", "variety", "live_action_movie", "live_action_tv"]
+
+def movie_matches_region(movie, target_region):
+    # 检查origin_country字段
+    origin_countries = movie.get("origin_country", [])
+    if target_region in origin_countries:
+        return True
+    
+    # 检查production_countries字段
+    production_countries = movie.get("production_countries", [])
+    for country in production_countries:
+        if country.get("iso_3166_1") == target_region:
+            return True
+    
+    return False
+
+def matches_media_type(movie: Dict, query: Optional[str], mediaType: str) -> bool:
+    """结果是否符合特殊类型（动画、纪录片、真人影视等）的题材要求"""
+    genre_ids = [g.get("id") for g in movie.get("genres", [])]
+    
+    if not (query and query.strip()):
+        # 真人影视的发现模式：过滤掉动画类型
+        if mediaType in ["live_action_movie", "live_action_tv"]:
+            return 16 not in genre_ids
+        return True
+    
+    # 对搜索结果进行特殊类型过滤
+    if mediaType == "animation":
+        return 16 in genre_ids
+    elif mediaType == "anime":
+        return 16 in genre_ids and (movie.get("media_type") == "tv" or bool(movie.get("name")))
+    elif mediaType == "documentary":
+        return 99 in genre_ids
+    elif mediaType == "variety":
+        return any(genre_id in [10767, 10764] for genre_id in genre_ids)
+    elif mediaType == "live_action_movie":
+        # 真人电影：是电影类型且不包含动画类型
+        return (movie.get("media_type") == "movie" or bool(movie.get("title"))) and 16 not in genre_ids
+    elif mediaType == "live_action_tv":
+        # 真人电视剧：是电视剧类型且不包含动画类型
+        return (movie.get("media_type") == "tv" or bool(movie.get("name"))) and 16 not in genre_ids
+    return True
+
+async def iter_search_results(
+    client: httpx.AsyncClient,
+    movies: List[Dict],
+    query: Optional[str],
+    mediaType: str,
+    deadline: Optional[Deadline] = None
+):
+    """按原顺序分批产出补充了题材并通过特殊类型过滤的结果
+
+    特殊类型的搜索需要详情中的完整题材，详情并发获取（受信号量限制），
+    前面连续的结果就绪后立即作为一批产出，不等待后面的详情。
+    时间预算用完时抛出 DeadlineExceeded（consumed 为已处理的结果数），
+    进行中的详情请求在后台继续完成。
+    """
+    deadline = deadline or Deadline()
+    if query and query.strip() and mediaType in SPECIAL_MEDIA_TYPES:
+        semaphore = asyncio.Semaphore(SEARCH_DETAIL_CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(fetch_movie_with_detail_genres(client, movie, semaphore))
+            for movie in movies
+        ]
+        keep_running = False
+        try:
+            index = 0
+            while index < len(tasks):
+                try:
+                    await deadline.wait(tasks[index])
+                except DeadlineExceeded:
+                    keep_running = True
+                    raise DeadlineExceeded(consumed=index)
+                batch = []
+                # 连同之后已经完成的详情一起产出
+                while index < len(tasks) and tasks[index].done():
+                    movie_with_details = tasks[index].result()
+                    if matches_media_type(movie_with_details, query, mediaType):
+                        batch.append(movie_with_details)
+                    index += 1
+                if batch:
+                    yield batch
+        finally:
+            for task in tasks:
+                if not task.done():
+                    if keep_running:
+                        detach(task)
+                    else:
+                        task.cancel()
+    else:
+        batch = []
+        for movie in movies:
+            movie_with_details = {
+                **movie,
+                "genres": get_genres_by_ids(movie.get("genre_ids", []))
+            }
+            if matches_media_type(movie_with_details, query, mediaType):
+                batch.append(movie_with_details)
+        if batch:
+            yield batch
+
+async def prepare_search(
+    query: Optional[str],
+    mediaType: str,
+    genre: Optional[str],
+    year: Optional[str],
+    region: Optional[str],
+    sortBy: str,
+    page: int,
+    excludeMarked: bool,
+    cursor: Optional[str],
+    db: Session,
+    current_user: Optional[User]
+) -> tuple:
+    """解析搜索条件和游标，返回 (url, params, 页内起始偏移, 搜索指纹, 已标记的电影ID)"""
+    # 获取用户已标记的电影ID（如果启用了排除功能）
+    marked_movie_ids = set()
+    if excludeMarked and current_user:
+        marked_movie_ids = await get_user_marked_movie_ids(current_user.id, db)
+        print(f"用户 {current_user.username} 已标记电影数量: {len(marked_movie_ids)}")
+    
+    url, params = build_search_request(query, mediaType, genre, year, region, sortBy, page)
+    
+    # 从游标记录的位置继续
+    fingerprint = search_fingerprint(url, params)
+    start_offset = 0
+    if cursor:
+        params["page"], start_offset = decode_cursor(cursor, fingerprint)
+    
+    return url, params, start_offset, fingerprint, marked_movie_ids
+
+def search_summary(page: int, fingerprint: str, progress: dict) -> Dict:
+    """搜索结果的分页信息"""
+    next_position = progress["next_position"]
+    summary = {
+        "total_pages": progress["total_pages"],
+        "total_results": progress["total_results"],
+        "page": page,
+        "next_cursor": encode_cursor(next_position, fingerprint) if next_position else None
+    }
+    if progress["stale"]:
+        # TMDB暂时不可用，结果来自过期缓存
+        summary["stale"] = True
+    if progress.get("partial"):
+        # 时间预算用完，只返回了部分结果，用 next_cursor 继续
+        summary["partial"] = True
+    return summary
+
+def mark_partial(progress: dict, consumed: int):
+    """结果处理中途用完时间预算：从本批第一条未处理的结果继续"""
+    positions = progress["batch_positions"]
+    if consumed < len(positions):
+        progress["next_position"] = positions[consumed]
+    progress["partial"] = True
+
+async def iter_search_batches(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    start_offset: int,
+    marked_movie_ids: set,
+    progress: dict,
+    deadline: Deadline
+):
+    """按TMDB页产出待处理的原始结果，分页进度写入 progress
+
+    时间预算用完时不再产出，progress 中 partial 为True，next_position 指向未获取的位置。
+    """
+    if marked_movie_ids:
+        # 使用智能获取策略，确保有足够的未标记电影
+        async for movies in iter_unmarked_pages(
+            client, url, params, 20, marked_movie_ids, progress,
+            max_pages=5, start_offset=start_offset, deadline=deadline
+        ):
+            yield movies
+    else:
+        # 常规单页获取
+        task = asyncio.ensure_future(tmdb_get(client, url, params))
+        try:
+            data = await deadline.wait(task)
+        except DeadlineExceeded:
+            detach(task)
+            progress.update(
+                total_pages=None, total_results=None, stale=False,
+                next_position=(params["page"], start_offset), batch_positions=[], partial=True
+            )
+            return
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        
+        total_pages = data.get("total_pages")
+        movies = data.get("results", [])[start_offset:][:20]
+        progress.update(
+            total_pages=total_pages,
+            total_results=data.get("total_results"),
+            stale=bool(data.get("stale")),
+            next_position=(params["page"] + 1, 0) if params["page"] < min(total_pages or 0, 500) else None,
+            batch_positions=[(params["page"], start_offset + index) for index in range(len(movies))],
+            partial=False
+        )
+        yield movies
+
+async def iter_search(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    start_offset: int,
+    marked_movie_ids: set,
+    query: Optional[str],
+    mediaType: str,
+    progress: dict,
+    deadline: Deadline,
+    with_credits: bool = False
+):
+    """按顺序产出最终的搜索结果批次
+
+    时间预算用完时停止，progress 中 partial 为True，next_position 指向第一条未处理的结果。
+    with_credits 为True时每批结果附加导演和主演。
+    """
+    async with contextlib.aclosing(
+        iter_search_batches(client, url, params, start_offset, marked_movie_ids, progress, deadline)
+    ) as pages:
+        async for movies in pages:
+            try:
+                async for batch in iter_search_results(client, movies, query, mediaType, deadline):
+                    if with_credits:
+                        batch = await attach_credits(client, batch, deadline)
+                    yield batch
+            except DeadlineExceeded as e:
+                mark_partial(progress, e.consumed)
+                return
+
+async def prefetch_after_search(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    top_results: List[Dict],
+    progress: dict
+):
+    """搜索响应发出后，以预取优先级预热前几个结果的详情（含演职人员）和下一页的TMDB结果
+
+    用户打开详情或翻页时直接命中缓存。结果不完整（partial）时上游已经较慢，不再预取；
+    预取失败只记录日志。
+    """
+    if progress.get("partial"):
+        return
+    
+    async def prefetch_title(movie: Dict):
+        try:
+            await get_title_details(client, movie["id"], result_media_type(movie))
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                print(f"预取详情失败: {movie['id']}, {e}")
+        except Exception as e:
+            print(f"预取详情失败: {movie['id']}, {e}")
+    
+    async def prefetch_next_page(page_num: int):
+        try:
+            await tmdb_get(client, url, {**params, "page": page_num})
         except Exception as e:
-            print(f"获取第{page_num}页电影失败: {str(e)}")
-            break
+            print(f"预取下一页失败: {url} page={page_num}, {e}")
     
-    return all_movies[:target_count], total_pages, total_results
+    with upstream_priority(PREFETCH):
+        jobs = [
+            prefetch_title(movie)
+            for movie in top_results[:SEARCH_PREFETCH_TOP_K]
+            if not media_type_index.is_known_missing(movie["id"])
+        ]
+        next_position = progress.get("next_position")
+        if SEARCH_PREFETCH_NEXT_PAGE and next_position:
+            jobs.append(prefetch_next_page(next_position[0]))
+        await asyncio.gather(*jobs)
 
 @router.get("/search")
 async def search_movies(
+    background_tasks: BackgroundTasks,
     query: Optional[str] = None,
     mediaType: str = "movie",
     genre: Optional[str] = None,
@@ -195,290 +771,198 @@ async def search_movies(
     sortBy: str = "popularity.desc",
     page: int = 1,
     excludeMarked: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    withCredits: bool = False,
     db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
-    """搜索电影"""
+    """搜索电影
+
+    响应中的 next_cursor 记录了本页结束时TMDB的页码和页内位置，
+    请求下一页时传入 cursor 可以从该位置继续，不会重复获取和过滤已经处理过的结果。
+    page 只用于回显客户端的页码；传入 cursor 时以 cursor 为准。
+    fields 选择结果中返回的字段（如 card），过滤完成后再投影，不影响筛选。
+    withCredits=true 时并发获取每个结果的导演和主演（director、cast）。
+    搜索超过 SEARCH_DEADLINE_SECONDS 时返回已处理的结果并带 partial: true，
+    next_cursor 指向第一条未处理的结果。
+    响应发出后在后台预取前几个结果的详情和下一页（见 prefetch_after_search）。
+    """
     try:
-        # 获取用户已标记的电影ID（如果启用了排除功能）
-        marked_movie_ids = set()
-        if excludeMarked and current_user:
-            marked_movie_ids = await get_user_marked_movie_ids(current_user.id, db)
-            print(f"用户 {current_user.username} 已标记电影数量: {len(marked_movie_ids)}")
+        deadline = Deadline(SEARCH_DEADLINE_SECONDS)
+        projection = parse_fields(fields)
+        url, params, start_offset, fingerprint, marked_movie_ids = await prepare_search(
+            query, mediaType, genre, year, region, sortBy, page, excludeMarked, cursor, db, current_user
+        )
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            params = {
-                "api_key": API_KEY,
-                "language": "zh-CN",
-                "page": page,
-                "include_adult": False
-            }
-
-            if query and query.strip():
-                # 搜索模式
-                base_media_type = mediaType
-                
-                # 处理特殊类型的搜索
-                if mediaType == "animation":
-                    base_media_type = "movie"
-                elif mediaType == "anime":
-                    base_media_type = "tv"
-                elif mediaType == "documentary":
-                    base_media_type = "movie"
-                elif mediaType == "variety":
-                    base_media_type = "tv"
-                elif mediaType == "live_action_movie":
-                    base_media_type = "movie"
-                elif mediaType == "live_action_tv":
-                    base_media_type = "tv"
-                
-                if base_media_type == "all":
-                    url = f"{BASE_URL}/search/multi"
-                else:
-                    url = f"{BASE_URL}/search/{base_media_type}"
-                
-                params["query"] = query.strip()
-            else:
-                # 发现模式
-                base_media_type = mediaType
-                genre_filter = genre
-                
-                # 处理特殊类型
-                if mediaType == "animation":
-                    base_media_type = "movie"
-                    genre_filter = f"16,{genre_filter}" if genre_filter else "16"
-                elif mediaType == "anime":
-                    base_media_type = "tv"
-                    genre_filter = f"16,{genre_filter}" if genre_filter else "16"
-                elif mediaType == "documentary":
-                    base_media_type = "movie"
-                    genre_filter = f"99,{genre_filter}" if genre_filter else "99"
-                elif mediaType == "variety":
-                    base_media_type = "tv"
-                    genre_filter = f"10767,10764,{genre_filter}" if genre_filter else "10767,10764"
-                elif mediaType == "live_action_movie":
-                    base_media_type = "movie"
-                    # 真人电影：不包含动画类型(16)
-                elif mediaType == "live_action_tv":
-                    base_media_type = "tv"
-                    # 真人电视剧：不包含动画类型(16)
-                
-                if base_media_type == "tv" or mediaType in ["anime", "variety", "live_action_tv"]:
-                    url = f"{BASE_URL}/discover/tv"
-                    params["sort_by"] = sortBy
-                    if year:
-                        if year == "before_1960":
-                            params["first_air_date.lte"] = "1959-12-31"
-                        elif "-" in year:  # 年代范围
-                            start_year, end_year = year.split("-")
-                            params["first_air_date.gte"] = f"{start_year}-01-01"
-                            params["first_air_date.lte"] = f"{end_year}-12-31"
-                        else:
-                            params["first_air_date_year"] = year
-                else:
-                    url = f"{BASE_URL}/discover/movie"
-                    params["sort_by"] = sortBy
-                    if year:
-                        if year == "before_1960":
-                            params["primary_release_date.lte"] = "1959-12-31"
-                        elif "-" in year:  # 年代范围
-                            start_year, end_year = year.split("-")
-                            params["primary_release_date.gte"] = f"{start_year}-01-01"
-                            params["primary_release_date.lte"] = f"{end_year}-12-31"
-                        else:
-                            params["primary_release_year"] = year
-                
-                if genre_filter:
-                    params["with_genres"] = genre_filter
-                
-                # 处理地区筛选
-                if region:
-                    if region == "OTHER":
-                        params["without_origin_country"] = "CN,HK,TW,US,KR,JP,FR,IT,GB,DE,IN,TH"
-                    else:
-                        params["with_origin_country"] = region
-
-            # 根据是否需要排除已标记电影采用不同策略
-            if excludeMarked and current_user and marked_movie_ids:
-                # 使用智能获取策略，确保有足够的未标记电影
-                movies, total_pages, total_results = await fetch_movies_until_enough(
-                    client, url, params, 20, marked_movie_ids, max_pages=5
-                )
-            else:
-                # 常规单页获取
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                movies = data.get("results", [])
-                total_pages = data.get("total_pages")
-                total_results = data.get("total_results")
-
-            # 检查是否需要特殊类型过滤或搜索模式
-            needs_detailed_filtering = (query and query.strip() and 
-                mediaType in ["animation", "anime", "documentary", "variety", "live_action_movie", "live_action_tv"])
-            
-            # 处理电影详情
-            if needs_detailed_filtering:
-                movies_with_details = []
-                for movie in movies[:20]:
-                    try:
-                        media_type = "tv" if (movie.get("media_type") == "tv" or (not movie.get("title") and movie.get("name"))) else "movie"
-                        detail_url = f"{BASE_URL}/{media_type}/{movie['id']}"
-                        
-                        detail_response = await client.get(detail_url, params={"api_key": API_KEY, "language": "zh-CN"})
-                        detail_data = detail_response.json()
-                        
-                        movies_with_details.append({
-                            **movie,
-                            "genres": detail_data.get("genres", movie.get("genre_ids", []))
-                        })
-                    except Exception as e:
-                        print(f"获取电影详情失败: {movie['id']}", str(e))
-                        movies_with_details.append({
-                            **movie,
-                            "genres": get_genres_by_ids(movie.get("genre_ids", []))
-                        })
-            elif mediaType in ["live_action_movie", "live_action_tv"]:
-                # 对于真人影视的发现模式，需要获取详细信息以过滤动画类型
-                movies_with_details = []
-                for movie in movies[:20]:
-                    movie_with_details = {
-                        **movie,
-                        "genres": get_genres_by_ids(movie.get("genre_ids", []))
-                    }
-                    
-                    # 过滤掉动画类型
-                    if not any(g.get("id") == 16 for g in movie_with_details.get("genres", [])):
-                        movies_with_details.append(movie_with_details)
-            else:
-                # 对于常规类型，也获取演职人员信息
-                movies_with_details = []
-                for movie in movies[:20]:
-                    movies_with_details.append({
-                        **movie,
-                        "genres": get_genres_by_ids(movie.get("genre_ids", []))
-                    })
-
-            # 定义地区匹配函数
-            def movie_matches_region(movie, target_region):
-                # 检查origin_country字段
-                origin_countries = movie.get("origin_country", [])
-                if target_region in origin_countries:
-                    return True
-                
-                # 检查production_countries字段
-                production_countries = movie.get("production_countries", [])
-                for country in production_countries:
-                    if country.get("iso_3166_1") == target_region:
-                        return True
-                
-                return False
-            
-            # 对搜索结果进行特殊类型过滤
-            filtered_movies = movies_with_details
-            if query and query.strip():
-                if mediaType == "animation":
-                    filtered_movies = [m for m in movies_with_details if any(g.get("id") == 16 for g in m.get("genres", []))]
-                elif mediaType == "anime":
-                    filtered_movies = [m for m in movies_with_details if any(g.get("id") == 16 for g in m.get("genres", [])) and (m.get("media_type") == "tv" or m.get("name"))]
-                elif mediaType == "documentary":
-                    filtered_movies = [m for m in movies_with_details if any(g.get("id") == 99 for g in m.get("genres", []))]
-                elif mediaType == "variety":
-                    filtered_movies = [m for m in movies_with_details if any(g.get("id") in [10767, 10764] for g in m.get("genres", []))]
-                elif mediaType == "live_action_movie":
-                    # 真人电影：是电影类型且不包含动画类型
-                    filtered_movies = [m for m in movies_with_details if 
-                                     (m.get("media_type") == "movie" or m.get("title")) and 
-                                     not any(g.get("id") == 16 for g in m.get("genres", []))]
-                elif mediaType == "live_action_tv":
-                    # 真人电视剧：是电视剧类型且不包含动画类型
-                    filtered_movies = [m for m in movies_with_details if 
-                                     (m.get("media_type") == "tv" or m.get("name")) and 
-                                     not any(g.get("id") == 16 for g in m.get("genres", []))]
-            
-            # 对于常规地区筛选，TMDB的with_origin_country参数已经足够准确
-            # 不需要额外的二次过滤，因为TMDB的原生筛选已经能满足用户需求
-
-            return {
-                "results": filtered_movies,
-                "total_pages": total_pages,
-                "total_results": total_results,
-                "page": page
-            }
-            
+        # 对于常规地区筛选，TMDB的with_origin_country参数已经足够准确
+        # 不需要额外的二次过滤，因为TMDB的原生筛选已经能满足用户需求
+        results = []
+        top_results = []
+        progress = {}
+        async for batch in iter_search(
+            client, url, params, start_offset, marked_movie_ids, query, mediaType, progress, deadline, withCredits
+        ):
+            top_results.extend(batch[:SEARCH_PREFETCH_TOP_K - len(top_results)])
+            results.extend(project_results(batch, projection))
+        
+        background_tasks.add_task(prefetch_after_search, client, url, params, top_results, progress)
+        return FastJSONResponse({"results": results, **search_summary(page, fingerprint, progress)})
+        
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"搜索电影失败: {str(e)}")
         print(f"异常详细信息: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"搜索电影失败: {str(e)}")
 
+@router.get("/search/stream")
+async def search_movies_stream(
+    query: Optional[str] = None,
+    mediaType: str = "movie",
+    genre: Optional[str] = None,
+    year: Optional[str] = None,
+    region: Optional[str] = None,
+    sortBy: str = "popularity.desc",
+    page: int = 1,
+    excludeMarked: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    withCredits: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """流式搜索电影（NDJSON）
+
+    参数（包括 fields、withCredits）与 /search 相同。每行一个JSON对象：每批结果就绪后立即输出
+    {"type": "results", "results": [...]}，最后输出分页信息
+    {"type": "summary", ...}；中途出错时输出 {"type": "error", "detail": ...}。
+    时间预算与 /search 相同，用完时 summary 中带 partial: true；流结束后同样在后台预取。
+    """
+    try:
+        deadline = Deadline(SEARCH_DEADLINE_SECONDS)
+        projection = parse_fields(fields)
+        url, params, start_offset, fingerprint, marked_movie_ids = await prepare_search(
+            query, mediaType, genre, year, region, sortBy, page, excludeMarked, cursor, db, current_user
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"搜索电影失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"搜索电影失败: {str(e)}")
+    
+    def ndjson_line(record: Dict) -> bytes:
+        return render_json(record) + b"\n"
+    
+    top_results = []
+    progress = {}
+    
+    async def stream():
+        count = 0
+        try:
+            async for batch in iter_search(
+                client, url, params, start_offset, marked_movie_ids, query, mediaType, progress, deadline, withCredits
+            ):
+                count += len(batch)
+                top_results.extend(batch[:SEARCH_PREFETCH_TOP_K - len(top_results)])
+                yield ndjson_line({"type": "results", "results": project_results(batch, projection)})
+            
+            yield ndjson_line({"type": "summary", "count": count, **search_summary(page, fingerprint, progress)})
+        except Exception as e:
+            # 响应头已经发出，只能在流中报告错误
+            print(f"流式搜索电影失败: {str(e)}")
+            yield ndjson_line({"type": "error", "detail": f"搜索电影失败: {str(e)}"})
+    
+    # 流结束后预取，与 /search 相同
+    prefetch = BackgroundTask(prefetch_after_search, client, url, params, top_results, progress)
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=prefetch)
+
 @router.get("/genres")
-async def get_genres():
+async def get_genres(request: Request, client: httpx.AsyncClient = Depends(get_http_client)):
     """获取电影分类"""
     try:
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 并发获取电影和电视剧类型
-            movie_response = await client.get(f"{BASE_URL}/genre/movie/list", params={"api_key": API_KEY, "language": "zh-CN"})
-            tv_response = await client.get(f"{BASE_URL}/genre/tv/list", params={"api_key": API_KEY, "language": "zh-CN"})
-            
-            movie_data, tv_data = movie_response, tv_response
-            movie_genres = movie_data.json().get("genres", [])
-            tv_genres = tv_data.json().get("genres", [])
-            
-            # 合并并去重
-            all_genres = movie_genres + tv_genres
-            unique_genres = []
-            seen_ids = set()
-            
-            for genre in all_genres:
-                if genre["id"] not in seen_ids:
-                    unique_genres.append(genre)
-                    seen_ids.add(genre["id"])
-            
-            return unique_genres
-            
+        # 由题材目录提供（启动时并发加载，后台定期刷新）
+        genres = await genre_catalog.get_genres(client)
+        headers = {}
+        if genre_catalog.stale:
+            # 列表格式不便加字段，用响应头标记最近一次刷新失败
+            headers["X-Data-Stale"] = "true"
+        
+        async def build():
+            return genres
+        
+        # 目录刷新后加载时间改变，缓存的响应体自然失效
+        return await cached_json_response(
+            request, f"movies:genres:{genre_catalog.loaded_at}", build, headers,
+            cache_control=CACHE_CONTROL_PUBLIC_SHORT if genre_catalog.stale else CACHE_CONTROL_PUBLIC_LONG
+        )
+        
     except Exception as e:
         print(f"获取分类失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取分类失败")
 
+def popular_request(media_type: str, page: int) -> tuple:
+    """热门列表的TMDB请求地址和参数（缓存预热使用相同的缓存key）"""
+    if media_type == "tv":
+        url = f"{BASE_URL}/tv/popular"
+    else:
+        url = f"{BASE_URL}/movie/popular"
+    return url, {"api_key": API_KEY, "language": "zh-CN", "page": page}
+
 @router.get("/popular")
-async def get_popular_content(page: int = 1, media_type: str = "movie"):
-    """获取热门内容 - 支持电影和电视剧"""
+async def get_popular_content(
+    request: Request,
+    page: int = 1,
+    media_type: str = "movie",
+    fields: Optional[str] = None,
+    withCredits: bool = False,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """获取热门内容 - 支持电影和电视剧
+
+    fields 选择结果中返回的字段（如 card），投影后的响应体按字段集合分别缓存。
+    withCredits=true 时并发获取每个结果的导演和主演（director、cast）。
+    """
     try:
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 根据media_type选择API端点
-            if media_type == "tv":
-                url = f"{BASE_URL}/tv/popular"
-            else:
-                url = f"{BASE_URL}/movie/popular"
-                
-            response = await client.get(url, params={
-                "api_key": API_KEY,
-                "language": "zh-CN",
-                "page": page
-            })
-            response.raise_for_status()
-            data = response.json()
+        projection = parse_fields(fields)
+
+        # 根据media_type选择API端点
+        url, params = popular_request(media_type, page)
+        
+        async def build():
+            data = await tmdb_get(client, url, params)
             content = data.get("results", [])
 
             # 处理内容，添加基础信息
-            content_with_details = []
-            for item in content:
-                content_with_details.append({
+            content_with_details = [
+                {
                     **item,
                     "genres": get_genres_by_ids(item.get("genre_ids", [])),
                     "media_type": media_type
-                })
+                }
+                for item in content
+            ]
+            if withCredits:
+                content_with_details = await attach_credits(client, content_with_details)
             
             return {
                 **data,
-                "results": content_with_details,
+                "results": project_results(content_with_details, projection),
                 "media_type": media_type
             }
-            
+        
+        # 缓存序列化和压缩后的响应体；过期数据不缓存
+        return await cached_json_response(
+            request, f"movies:popular:{media_type}:{page}:{fields_key(projection)}:{int(withCredits)}", build,
+            cacheable=lambda data: not data.get("stale"),
+            cache_control=CACHE_CONTROL_PUBLIC_SHORT
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"获取热门{media_type}失败: {str(e)}")
@@ -486,48 +970,85 @@ async def get_popular_content(page: int = 1, media_type: str = "movie"):
         raise HTTPException(status_code=500, detail=f"获取热门{media_type}失败: {str(e)}")
 
 @router.get("/popular/movies")
-async def get_popular_movies(page: int = 1):
+async def get_popular_movies(
+    request: Request,
+    page: int = 1,
+    fields: Optional[str] = None,
+    withCredits: bool = False,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """获取热门电影"""
-    return await get_popular_content(page=page, media_type="movie")
+    return await get_popular_content(
+        request, page=page, media_type="movie", fields=fields, withCredits=withCredits, client=client
+    )
 
 @router.get("/popular/tv")
-async def get_popular_tv_shows(page: int = 1):
+async def get_popular_tv_shows(
+    request: Request,
+    page: int = 1,
+    fields: Optional[str] = None,
+    withCredits: bool = False,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """获取热门电视剧"""
-    return await get_popular_content(page=page, media_type="tv")
+    return await get_popular_content(
+        request, page=page, media_type="tv", fields=fields, withCredits=withCredits, client=client
+    )
 
 @router.get("/{movie_id}")
-async def get_movie_detail(movie_id: int):
-    """获取单个电影/电视剧详情"""
+async def get_movie_detail(
+    movie_id: int,
+    media_type: Optional[str] = None,
+    fields: Optional[str] = None,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """获取单个电影/电视剧详情
+
+    传入media_type时直接请求对应接口；否则先查媒体类型索引，
+    索引中没有时按电影、电视剧的顺序尝试。电影和电视剧的ID会重复，
+    客户端知道类型时应传入media_type；只有前一种类型返回404时才尝试另一种。
+    fields 选择返回的字段（如 detail），未传入时返回完整的TMDB数据。
+    """
     try:
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 先尝试作为电影获取
-            try:
-                movie_url = f"{BASE_URL}/movie/{movie_id}"
-                movie_response = await client.get(movie_url, params={"api_key": API_KEY, "language": "zh-CN"})
-                if movie_response.status_code == 200:
-                    movie_data = movie_response.json()
-                    
-                    return {
-                        **movie_data,
-                        "media_type": "movie"
-                    }
-            except:
-                pass
+        projection = parse_fields(fields)
+        if media_type is not None and media_type not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="无效的媒体类型")
+        
+        if media_type:
+            candidates = [media_type]
+        else:
+            if media_type_index.is_known_missing(movie_id):
+                raise HTTPException(status_code=404, detail="电影/电视剧不存在")
             
-            # 如果电影接口失败，尝试作为电视剧获取
-            tv_url = f"{BASE_URL}/tv/{movie_id}"
-            tv_response = await client.get(tv_url, params={"api_key": API_KEY, "language": "zh-CN"})
-            if tv_response.status_code == 200:
-                tv_data = tv_response.json()
-                
-                return {
-                    **tv_data,
-                    "media_type": "tv"
-                }
+            known_type = media_type_index.get(movie_id)
+            if known_type:
+                # 索引可能过时，仍保留另一种类型作为后备
+                candidates = [known_type] + [t for t in MEDIA_TYPES if t != known_type]
             else:
-                raise HTTPException(status_code=404, detail="电影/电视剧不存在")
-                
+                candidates = list(MEDIA_TYPES)
+        
+        for candidate in candidates:
+            try:
+                detail_data = await get_title_details(client, movie_id, candidate)
+            except httpx.HTTPStatusError as e:
+                # 只有明确的404才尝试另一种类型；其他错误换类型可能返回同ID的另一部作品
+                if e.response.status_code != 404:
+                    raise
+                continue
+            
+            media_type_index.learn(movie_id, candidate)
+            return FastJSONResponse(project({
+                **detail_data,
+                "media_type": candidate
+            }, projection))
+        
+        # 两种类型都明确返回404时才做负缓存
+        if not media_type:
+            media_type_index.record_miss(movie_id)
+        raise HTTPException(status_code=404, detail="电影/电视剧不存在")
+            
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"获取电影详情失败: {movie_id}, {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取电影详情失败: {str(e)}")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_
@@ -13,6 +13,12 @@ from database import get_db
 from models import User, WatchStatus
 from schemas import WatchStatusCreate, WatchStatusUpdate, WatchStatus as WatchStatusSchema
 from auth import get_current_user
+from http_client import get_http_client
+from title_catalog import get_title, get_title_details, get_title_credits
+from media_type_index import media_type_index
+from library_version import library_etag
+from upstream_priority import batch_priority
+from conditional import etag_matches, not_modified, CACHE_CONTROL_PRIVATE
 
 load_dotenv()
 
@@ -88,6 +94,7 @@ async def create_or_update_watch_status(
             record_id = db_watch_status.id
         
         db.commit()
+        media_type_index.learn(watch_data.movie_id, watch_data.media_type)
         
         return {
             "message": "观看状态保存成功",
@@ -102,14 +109,25 @@ async def create_or_update_watch_status(
 
 @router.get("/", response_model=List[WatchStatusSchema])
 async def get_watch_status_list(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取用户的观看状态列表"""
+    """获取用户的观看状态列表
+
+    ETag由用户观看记录的版本号生成，未变化时直接返回304，不查询列表。
+    """
     try:
+        etag = library_etag(request, db, current_user.id, "watch_status")
+        if etag_matches(request, etag):
+            return not_modified(etag, CACHE_CONTROL_PRIVATE)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL_PRIVATE
+        
         query = db.query(WatchStatus).filter(WatchStatus.user_id == current_user.id)
         
         if status:
@@ -237,10 +255,32 @@ def get_genres_string(genres: List[dict]) -> str:
     
     return ', '.join([genre["name"] for genre in genres])
 
-@router.post("/update-production-countries")
+async def fetch_movie_or_tv(
+    client: httpx.AsyncClient,
+    movie_id: int,
+    credits: bool = False,
+    media_type: Optional[str] = None
+) -> Optional[dict]:
+    """获取详情（或演职人员信息），先按记录的媒体类型（默认电影）获取，404时换另一种类型，都不存在返回None
+
+    详情和演职人员信息由影视目录一次请求同时获取并保存。
+    电影和电视剧的ID会重复，429/5xx等其他错误直接抛出，不换类型重试。
+    """
+    fetch = get_title_credits if credits else get_title_details
+    first = media_type if media_type in ("movie", "tv") else "movie"
+    for candidate in (first, "tv" if first == "movie" else "movie"):
+        try:
+            return await fetch(client, movie_id, candidate)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                raise
+    return None
+
+@router.post("/update-production-countries", dependencies=[Depends(batch_priority)])
 async def update_missing_production_countries(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """批量补充缺少出品地区信息的电影数据"""
     try:
@@ -264,61 +304,46 @@ async def update_missing_production_countries(
         updated_count = 0
         failed_count = 0
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for movie_record in missing_countries_movies:
-                try:
-                    # 首先尝试作为电影获取详情
-                    movie_url = f"{BASE_URL}/movie/{movie_record.movie_id}"
-                    response = await client.get(movie_url, params={
-                        "api_key": API_KEY,
-                        "language": "zh-CN"
-                    })
+        for movie_record in missing_countries_movies:
+            try:
+                # 先按记录的媒体类型获取详情，失败时尝试另一种类型
+                data = await fetch_movie_or_tv(client, movie_record.movie_id, media_type=movie_record.media_type)
+                
+                if data is not None:
                     
-                    if response.status_code != 200:
-                        # 如果电影API失败，尝试电视剧API
-                        tv_url = f"{BASE_URL}/tv/{movie_record.movie_id}"
-                        response = await client.get(tv_url, params={
-                            "api_key": API_KEY,
-                            "language": "zh-CN"
-                        })
+                    # 提取制作国家信息
+                    production_countries = data.get("production_countries", [])
+                    countries_string = translate_countries(production_countries)
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        
-                        # 提取制作国家信息
-                        production_countries = data.get("production_countries", [])
-                        countries_string = translate_countries(production_countries)
-                        
-                        # 同时更新其他可能缺少的信息
-                        genres = data.get("genres", [])
-                        genres_string = get_genres_string(genres)
-                        
-                        vote_average = data.get("vote_average", 0)
-                        overview = data.get("overview", movie_record.overview or '暂无简介')
-                        
-                        # 更新数据库记录
-                        movie_record.production_countries = countries_string
-                        if not movie_record.genres or movie_record.genres == '暂无分类':
-                            movie_record.genres = genres_string
-                        if not movie_record.vote_average:
-                            movie_record.vote_average = vote_average
-                        if not movie_record.overview or movie_record.overview == '暂无简介':
-                            movie_record.overview = overview
-                        
-                        movie_record.updated_at = datetime.utcnow()
-                        
-                        updated_count += 1
-                        print(f"成功更新电影: {movie_record.movie_title} ({movie_record.movie_id}) - {countries_string}")
-                        
-                    else:
-                        failed_count += 1
-                        print(f"获取电影详情失败: {movie_record.movie_title} ({movie_record.movie_id})")
-                        
-                except Exception as e:
+                    # 同时更新其他可能缺少的信息
+                    genres = data.get("genres", [])
+                    genres_string = get_genres_string(genres)
+                    
+                    vote_average = data.get("vote_average", 0)
+                    overview = data.get("overview", movie_record.overview or '暂无简介')
+                    
+                    # 更新数据库记录
+                    movie_record.production_countries = countries_string
+                    if not movie_record.genres or movie_record.genres == '暂无分类':
+                        movie_record.genres = genres_string
+                    if not movie_record.vote_average:
+                        movie_record.vote_average = vote_average
+                    if not movie_record.overview or movie_record.overview == '暂无简介':
+                        movie_record.overview = overview
+                    
+                    movie_record.updated_at = datetime.utcnow()
+                    
+                    updated_count += 1
+                    print(f"成功更新电影: {movie_record.movie_title} ({movie_record.movie_id}) - {countries_string}")
+                    
+                else:
                     failed_count += 1
-                    print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
-                    continue
+                    print(f"获取电影详情失败: {movie_record.movie_title} ({movie_record.movie_id})")
+                    
+            except Exception as e:
+                failed_count += 1
+                print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
+                continue
         
         # 提交所有更改
         db.commit()
@@ -358,10 +383,11 @@ def get_cast_from_credits(credits: dict) -> str:
     
     return ", ".join(cast_list) if cast_list else "暂无主演信息"
 
-@router.post("/update-overview")
+@router.post("/update-overview", dependencies=[Depends(batch_priority)])
 async def update_missing_overview(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """批量补充缺少简介的电影数据"""
     try:
@@ -384,44 +410,29 @@ async def update_missing_overview(
         updated_count = 0
         failed_count = 0
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for movie_record in missing_overview_movies:
-                try:
-                    # 首先尝试作为电影获取详情
-                    movie_url = f"{BASE_URL}/movie/{movie_record.movie_id}"
-                    response = await client.get(movie_url, params={
-                        "api_key": API_KEY,
-                        "language": "zh-CN"
-                    })
-                    
-                    if response.status_code != 200:
-                        # 如果电影API失败，尝试电视剧API
-                        tv_url = f"{BASE_URL}/tv/{movie_record.movie_id}"
-                        response = await client.get(tv_url, params={
-                            "api_key": API_KEY,
-                            "language": "zh-CN"
-                        })
+        for movie_record in missing_overview_movies:
+            try:
+                # 先按记录的媒体类型获取详情，失败时尝试另一种类型
+                data = await fetch_movie_or_tv(client, movie_record.movie_id, media_type=movie_record.media_type)
+                
+                if data is not None:
+                    overview = data.get("overview", movie_record.overview or '暂无简介')
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        overview = data.get("overview", movie_record.overview or '暂无简介')
-                        
-                        if overview and overview != '暂无简介':
-                            movie_record.overview = overview
-                            movie_record.updated_at = datetime.utcnow()
-                            updated_count += 1
-                            print(f"成功更新简介: {movie_record.movie_title} ({movie_record.movie_id})")
-                        else:
-                            failed_count += 1
+                    if overview and overview != '暂无简介':
+                        movie_record.overview = overview
+                        movie_record.updated_at = datetime.utcnow()
+                        updated_count += 1
+                        print(f"成功更新简介: {movie_record.movie_title} ({movie_record.movie_id})")
                     else:
                         failed_count += 1
-                        print(f"获取电影详情失败: {movie_record.movie_title} ({movie_record.movie_id})")
-                        
-                except Exception as e:
+                else:
                     failed_count += 1
-                    print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
-                    continue
+                    print(f"获取电影详情失败: {movie_record.movie_title} ({movie_record.movie_id})")
+                    
+            except Exception as e:
+                failed_count += 1
+                print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
+                continue
         
         db.commit()
         
@@ -437,10 +448,11 @@ async def update_missing_overview(
         print(f"批量更新简介失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"批量更新简介失败: {str(e)}")
 
-@router.post("/update-director")
+@router.post("/update-director", dependencies=[Depends(batch_priority)])
 async def update_missing_director(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """批量补充缺少导演信息的电影数据"""
     try:
@@ -463,44 +475,29 @@ async def update_missing_director(
         updated_count = 0
         failed_count = 0
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for movie_record in missing_director_movies:
-                try:
-                    # 首先尝试作为电影获取演职员信息
-                    credits_url = f"{BASE_URL}/movie/{movie_record.movie_id}/credits"
-                    response = await client.get(credits_url, params={
-                        "api_key": API_KEY,
-                        "language": "zh-CN"
-                    })
-                    
-                    if response.status_code != 200:
-                        # 如果电影API失败，尝试电视剧API
-                        tv_credits_url = f"{BASE_URL}/tv/{movie_record.movie_id}/credits"
-                        response = await client.get(tv_credits_url, params={
-                            "api_key": API_KEY,
-                            "language": "zh-CN"
-                        })
+        for movie_record in missing_director_movies:
+            try:
+                # 先按记录的媒体类型获取演职员信息，失败时尝试另一种类型
+                credits_data = await fetch_movie_or_tv(client, movie_record.movie_id, credits=True, media_type=movie_record.media_type)
+                
+                if credits_data is not None:
+                    director = get_director_from_credits(credits_data)
                     
-                    if response.status_code == 200:
-                        credits_data = response.json()
-                        director = get_director_from_credits(credits_data)
-                        
-                        if director and director != '暂无导演信息':
-                            movie_record.director = director
-                            movie_record.updated_at = datetime.utcnow()
-                            updated_count += 1
-                            print(f"成功更新导演: {movie_record.movie_title} ({movie_record.movie_id}) - {director}")
-                        else:
-                            failed_count += 1
+                    if director and director != '暂无导演信息':
+                        movie_record.director = director
+                        movie_record.updated_at = datetime.utcnow()
+                        updated_count += 1
+                        print(f"成功更新导演: {movie_record.movie_title} ({movie_record.movie_id}) - {director}")
                     else:
                         failed_count += 1
-                        print(f"获取演职员信息失败: {movie_record.movie_title} ({movie_record.movie_id})")
-                        
-                except Exception as e:
+                else:
                     failed_count += 1
-                    print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
-                    continue
+                    print(f"获取演职员信息失败: {movie_record.movie_title} ({movie_record.movie_id})")
+                    
+            except Exception as e:
+                failed_count += 1
+                print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
+                continue
         
         db.commit()
         
@@ -516,10 +513,11 @@ async def update_missing_director(
         print(f"批量更新导演信息失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"批量更新导演信息失败: {str(e)}")
 
-@router.post("/update-cast")
+@router.post("/update-cast", dependencies=[Depends(batch_priority)])
 async def update_missing_cast(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """批量补充缺少主演信息的电影数据"""
     try:
@@ -542,44 +540,29 @@ async def update_missing_cast(
         updated_count = 0
         failed_count = 0
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for movie_record in missing_cast_movies:
-                try:
-                    # 首先尝试作为电影获取演职员信息
-                    credits_url = f"{BASE_URL}/movie/{movie_record.movie_id}/credits"
-                    response = await client.get(credits_url, params={
-                        "api_key": API_KEY,
-                        "language": "zh-CN"
-                    })
-                    
-                    if response.status_code != 200:
-                        # 如果电影API失败，尝试电视剧API
-                        tv_credits_url = f"{BASE_URL}/tv/{movie_record.movie_id}/credits"
-                        response = await client.get(tv_credits_url, params={
-                            "api_key": API_KEY,
-                            "language": "zh-CN"
-                        })
+        for movie_record in missing_cast_movies:
+            try:
+                # 先按记录的媒体类型获取演职员信息，失败时尝试另一种类型
+                credits_data = await fetch_movie_or_tv(client, movie_record.movie_id, credits=True, media_type=movie_record.media_type)
+                
+                if credits_data is not None:
+                    cast = get_cast_from_credits(credits_data)
                     
-                    if response.status_code == 200:
-                        credits_data = response.json()
-                        cast = get_cast_from_credits(credits_data)
-                        
-                        if cast and cast != '暂无主演信息':
-                            movie_record.cast = cast
-                            movie_record.updated_at = datetime.utcnow()
-                            updated_count += 1
-                            print(f"成功更新主演: {movie_record.movie_title} ({movie_record.movie_id}) - {cast}")
-                        else:
-                            failed_count += 1
+                    if cast and cast != '暂无主演信息':
+                        movie_record.cast = cast
+                        movie_record.updated_at = datetime.utcnow()
+                        updated_count += 1
+                        print(f"成功更新主演: {movie_record.movie_title} ({movie_record.movie_id}) - {cast}")
                     else:
                         failed_count += 1
-                        print(f"获取演职员信息失败: {movie_record.movie_title} ({movie_record.movie_id})")
-                        
-                except Exception as e:
+                else:
                     failed_count += 1
-                    print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
-                    continue
+                    print(f"获取演职员信息失败: {movie_record.movie_title} ({movie_record.movie_id})")
+                    
+            except Exception as e:
+                failed_count += 1
+                print(f"处理电影失败: {movie_record.movie_title} ({movie_record.movie_id}) - {str(e)}")
+                continue
         
         db.commit()
         
@@ -624,11 +607,80 @@ def extract_director_cast_tv(credits: dict) -> tuple[str, str]:
     
     return director, cast
 
+def apply_title_metadata(watch_status: WatchStatus, media_type: str, details_data: dict, credits_data: dict) -> dict:
+    """用影视目录的详情和演职人员信息更新观看记录的元数据，返回有变化的字段（旧值和新值）
+
+    不修改 updated_at，也不提交，由调用方处理。
+    """
+    # 保存原始信息以便比较
+    changes = {}
+    
+    # 1. 更新导演和主演
+    if media_type == 'tv':
+        new_director, new_cast = extract_director_cast_tv(credits_data)
+    else:
+        new_director = get_director_from_credits(credits_data)
+        new_cast = get_cast_from_credits(credits_data)
+    
+    if watch_status.director != new_director:
+        changes["director"] = {"old": watch_status.director, "new": new_director}
+        watch_status.director = new_director
+    
+    if watch_status.cast != new_cast:
+        changes["cast"] = {"old": watch_status.cast, "new": new_cast}
+        watch_status.cast = new_cast
+    
+    # 2. 更新题材信息
+    genres = details_data.get("genres", [])
+    new_genres = get_genres_string(genres)
+    if watch_status.genres != new_genres:
+        changes["genres"] = {"old": watch_status.genres, "new": new_genres}
+        watch_status.genres = new_genres
+    
+    # 3. 更新制作国家
+    production_countries = details_data.get("production_countries", [])
+    new_countries = translate_countries(production_countries)
+    if watch_status.production_countries != new_countries:
+        changes["production_countries"] = {"old": watch_status.production_countries, "new": new_countries}
+        watch_status.production_countries = new_countries
+    
+    # 4. 更新评分
+    new_vote_average = details_data.get("vote_average", 0)
+    if watch_status.vote_average != new_vote_average:
+        changes["vote_average"] = {"old": watch_status.vote_average, "new": new_vote_average}
+        watch_status.vote_average = new_vote_average
+    
+    # 5. 更新简介
+    new_overview = details_data.get("overview", "暂无简介")
+    if new_overview and new_overview != "暂无简介" and watch_status.overview != new_overview:
+        changes["overview"] = {"old": watch_status.overview, "new": new_overview}
+        watch_status.overview = new_overview
+    
+    # 6. 更新发布日期
+    if media_type == 'tv':
+        new_release_date = details_data.get("first_air_date", "")
+        if new_release_date and watch_status.first_air_date != new_release_date:
+            changes["first_air_date"] = {"old": watch_status.first_air_date, "new": new_release_date}
+            watch_status.first_air_date = new_release_date
+    else:
+        new_release_date = details_data.get("release_date", "")
+        if new_release_date and watch_status.release_date != new_release_date:
+            changes["release_date"] = {"old": watch_status.release_date, "new": new_release_date}
+            watch_status.release_date = new_release_date
+    
+    # 更新媒体类型
+    if watch_status.media_type != media_type:
+        changes["media_type"] = {"old": watch_status.media_type, "new": media_type}
+        watch_status.media_type = media_type
+    
+    return changes
+
 @router.post("/{movie_id}/fix-metadata")
 async def fix_single_movie_metadata(
     movie_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """修复单个电影的完整元数据信息（导演、主演、题材、制作国家、简介等）"""
     try:
@@ -641,132 +693,44 @@ async def fix_single_movie_metadata(
         if not watch_status:
             raise HTTPException(status_code=404, detail="未找到该电影的观看记录")
         
-        timeout = httpx.Timeout(30.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 确定媒体类型
-            media_type = watch_status.media_type if watch_status.media_type else 'movie'
-            
-            # 获取电影/电视剧详细信息
-            if media_type == 'tv':
-                details_url = f"{BASE_URL}/tv/{movie_id}"
-                credits_url = f"{BASE_URL}/tv/{movie_id}/credits"
-            else:
-                details_url = f"{BASE_URL}/movie/{movie_id}"
-                credits_url = f"{BASE_URL}/movie/{movie_id}/credits"
-            
-            # 获取详细信息
-            details_response = await client.get(details_url, params={
-                "api_key": API_KEY,
-                "language": "zh-CN"
-            })
-            
-            # 获取演职员信息
-            credits_response = await client.get(credits_url, params={
-                "api_key": API_KEY,
-                "language": "zh-CN"
-            })
-            
-            # 如果第一次尝试失败，尝试另一种媒体类型
-            if details_response.status_code != 200 or credits_response.status_code != 200:
-                if media_type == 'tv':
-                    details_url = f"{BASE_URL}/movie/{movie_id}"
-                    credits_url = f"{BASE_URL}/movie/{movie_id}/credits"
-                    media_type = 'movie'
-                else:
-                    details_url = f"{BASE_URL}/tv/{movie_id}"
-                    credits_url = f"{BASE_URL}/tv/{movie_id}/credits"
-                    media_type = 'tv'
-                
-                details_response = await client.get(details_url, params={
-                    "api_key": API_KEY,
-                    "language": "zh-CN"
-                })
-                
-                credits_response = await client.get(credits_url, params={
-                    "api_key": API_KEY,
-                    "language": "zh-CN"
-                })
-            
-            if details_response.status_code != 200:
-                raise HTTPException(status_code=400, detail="无法获取该电影的详细信息")
-            
-            if credits_response.status_code != 200:
-                raise HTTPException(status_code=400, detail="无法获取该电影的演职员信息")
-            
-            details_data = details_response.json()
-            credits_data = credits_response.json()
-            
-            # 保存原始信息以便比较
-            changes = {}
-            
-            # 1. 更新导演和主演
-            if media_type == 'tv':
-                new_director, new_cast = extract_director_cast_tv(credits_data)
-            else:
-                new_director = get_director_from_credits(credits_data)
-                new_cast = get_cast_from_credits(credits_data)
-            
-            if watch_status.director != new_director:
-                changes["director"] = {"old": watch_status.director, "new": new_director}
-                watch_status.director = new_director
-            
-            if watch_status.cast != new_cast:
-                changes["cast"] = {"old": watch_status.cast, "new": new_cast}
-                watch_status.cast = new_cast
-            
-            # 2. 更新题材信息
-            genres = details_data.get("genres", [])
-            new_genres = get_genres_string(genres)
-            if watch_status.genres != new_genres:
-                changes["genres"] = {"old": watch_status.genres, "new": new_genres}
-                watch_status.genres = new_genres
-            
-            # 3. 更新制作国家
-            production_countries = details_data.get("production_countries", [])
-            new_countries = translate_countries(production_countries)
-            if watch_status.production_countries != new_countries:
-                changes["production_countries"] = {"old": watch_status.production_countries, "new": new_countries}
-                watch_status.production_countries = new_countries
-            
-            # 4. 更新评分
-            new_vote_average = details_data.get("vote_average", 0)
-            if watch_status.vote_average != new_vote_average:
-                changes["vote_average"] = {"old": watch_status.vote_average, "new": new_vote_average}
-                watch_status.vote_average = new_vote_average
-            
-            # 5. 更新简介
-            new_overview = details_data.get("overview", "暂无简介")
-            if new_overview and new_overview != "暂无简介" and watch_status.overview != new_overview:
-                changes["overview"] = {"old": watch_status.overview, "new": new_overview}
-                watch_status.overview = new_overview
-            
-            # 6. 更新发布日期
-            if media_type == 'tv':
-                new_release_date = details_data.get("first_air_date", "")
-                if new_release_date and watch_status.first_air_date != new_release_date:
-                    changes["first_air_date"] = {"old": watch_status.first_air_date, "new": new_release_date}
-                    watch_status.first_air_date = new_release_date
-            else:
-                new_release_date = details_data.get("release_date", "")
-                if new_release_date and watch_status.release_date != new_release_date:
-                    changes["release_date"] = {"old": watch_status.release_date, "new": new_release_date}
-                    watch_status.release_date = new_release_date
-            
-            # 更新媒体类型
-            if watch_status.media_type != media_type:
-                changes["media_type"] = {"old": watch_status.media_type, "new": media_type}
-                watch_status.media_type = media_type
-            
-            watch_status.updated_at = datetime.utcnow()
-            db.commit()
-            
-            return {
-                "message": "电影元数据修复成功",
-                "movie_title": watch_status.movie_title,
-                "media_type": media_type,
-                "changes_count": len(changes),
-                "changes": changes
-            }
+        # 确定媒体类型
+        media_type = watch_status.media_type if watch_status.media_type else 'movie'
+        
+        async def fetch_details_and_credits(media_type: str) -> tuple:
+            """一次请求获取详细信息和演职员信息，TMDB返回404时都为None"""
+            try:
+                return await get_title(client, movie_id, media_type)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                return None, None
+        
+        # 获取详细信息和演职员信息
+        details_data, credits_data = await fetch_details_and_credits(media_type)
+        
+        # 如果第一次尝试失败，尝试另一种媒体类型
+        if details_data is None:
+            media_type = 'movie' if media_type == 'tv' else 'tv'
+            details_data, credits_data = await fetch_details_and_credits(media_type)
+        
+        if details_data is None:
+            raise HTTPException(status_code=400, detail="无法获取该电影的详细信息")
+        
+        if credits_data is None:
+            raise HTTPException(status_code=400, detail="无法获取该电影的演职员信息")
+        
+        changes = apply_title_metadata(watch_status, media_type, details_data, credits_data)
+        
+        watch_status.updated_at = datetime.utcnow()
+        db.commit()
+        
+        return {
+            "message": "电影元数据修复成功",
+            "movie_title": watch_status.movie_title,
+            "media_type": media_type,
+            "changes_count": len(changes),
+            "changes": changes
+        }
     
     except HTTPException:
         raise
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Title
+from tmdb_client import tmdb_get, is_upstream_failure, TMDB_API_KEY, TMDB_BASE_URL
+
+# 本地目录数据的有效期（小时），超过后重新从TMDB获取
+TITLE_CATALOG_MAX_AGE_HOURS = float(os.getenv("TITLE_CATALOG_MAX_AGE_HOURS", "72"))
+
+# 保存演职人员时保留的职位和主演数量
+CREDITS_CREW_JOBS = {"Director", "Creator", "Showrunner", "Executive Producer", "Writer", "Screenplay"}
+CREDITS_MAX_CAST = 20
+
+_stats = {"local_hits": 0, "upstream_fetches": 0, "stale_served": 0}
+
+def normalize_credits(credits: Dict) -> Dict:
+    """只保留导演、创作者和前几位主演，减少存储空间"""
+    return {
+        "cast": [
+            {"id": person.get("id"), "name": person.get("name"), "character": person.get("character"), "order": person.get("order")}
+            for person in (credits.get("cast") or [])[:CREDITS_MAX_CAST]
+        ],
+        "crew": [
+            {"id": person.get("id"), "name": person.get("name"), "job": person.get("job")}
+            for person in (credits.get("crew") or [])
+            if person.get("job") in CREDITS_CREW_JOBS
+        ]
+    }
+
+def is_fresh(fetched_at: Optional[datetime]) -> bool:
+    if fetched_at is None:
+        return False
+    return datetime.utcnow() - fetched_at < timedelta(hours=TITLE_CATALOG_MAX_AGE_HOURS)
+
+def read_title(db: Session, tmdb_id: int, media_type: str) -> Optional[Title]:
+    return db.get(Title, (tmdb_id, media_type))
+
+def load_fresh_details(db: Session, tmdb_id: int, media_type: str) -> Optional[Dict]:
+    """读取有效期内的本地详情，不存在或已过期返回None"""
+    row = read_title(db, tmdb_id, media_type)
+    if row is None or not row.details or not is_fresh(row.details_fetched_at):
+        return None
+    return json.loads(row.details)
+
+def load_fresh_credits(db: Session, tmdb_id: int, media_type: str) -> Optional[Dict]:
+    """读取有效期内的本地演职人员信息，不存在或已过期返回None"""
+    row = read_title(db, tmdb_id, media_type)
+    if row is None or not row.credits or not is_fresh(row.credits_fetched_at):
+        return None
+    return json.loads(row.credits)
+
+def load_fresh_title(db: Session, tmdb_id: int, media_type: str) -> Optional[Tuple[Dict, Dict]]:
+    """读取有效期内的本地详情和演职人员信息，任一部分缺失或过期返回None"""
+    row = read_title(db, tmdb_id, media_type)
+    if row is None or not row.details or not row.credits:
+        return None
+    if not is_fresh(row.details_fetched_at) or not is_fresh(row.credits_fetched_at):
+        return None
+    return json.loads(row.details), json.loads(row.credits)
+
+def load_expired_title(db: Session, tmdb_id: int, media_type: str) -> Optional[Dict]:
+    """读取本地详情（附带credits字段），不检查有效期（上游不可用时使用）"""
+    row = read_title(db, tmdb_id, media_type)
+    if row is None or not row.details:
+        return None
+    details = json.loads(row.details)
+    details["credits"] = json.loads(row.credits) if row.credits else {}
+    return details
+
+def save_title(
+    db: Session,
+    tmdb_id: int,
+    media_type: str,
+    details: Optional[Dict] = None,
+    credits: Optional[Dict] = None
+):
+    """写入或更新本地目录中的详情和/或演职人员信息"""
+    row = read_title(db, tmdb_id, media_type)
+    if row is None:
+        row = Title(tmdb_id=tmdb_id, media_type=media_type)
+        db.add(row)
+
+    now = datetime.utcnow()
+    if details is not None:
+        details = {key: value for key, value in details.items() if key not in ("credits", "stale")}
+        row.title = details.get("title") or details.get("name")
+        row.details = json.dumps(details, ensure_ascii=False)
+        row.details_fetched_at = now
+    if credits is not None:
+        row.credits = json.dumps(normalize_credits(credits), ensure_ascii=False)
+        row.credits_fetched_at = now
+    db.commit()
+
+def _store_title(tmdb_id: int, media_type: str, data: Dict):
+    db = SessionLocal()
+    try:
+        save_title(db, tmdb_id, media_type, **data)
+    except Exception as e:
+        db.rollback()
+        print(f"保存影视目录失败: {tmdb_id} ({media_type}), {str(e)}")
+    finally:
+        db.close()
+
+async def store_title(tmdb_id: int, media_type: str, **data):
+    """使用独立的会话写入本地目录，写入失败不影响调用方
+
+    数据库读写和JSON编解码在线程中执行，并发获取详情时不阻塞事件循环。
+    """
+    await asyncio.to_thread(_store_title, tmdb_id, media_type, data)
+
+def _load(loader, tmdb_id: int, media_type: str) -> Optional[Any]:
+    db = SessionLocal()
+    try:
+        return loader(db, tmdb_id, media_type)
+    except Exception as e:
+        print(f"读取影视目录失败: {tmdb_id} ({media_type}), {str(e)}")
+        return None
+    finally:
+        db.close()
+
+async def _load_quietly(loader, tmdb_id: int, media_type: str) -> Optional[Any]:
+    """在线程中读取本地目录，读取失败时返回None"""
+    return await asyncio.to_thread(_load, loader, tmdb_id, media_type)
+
+async def _fetch_or_expired(fetch, expired_loader, tmdb_id: int, media_type: str) -> Dict:
+    """请求TMDB，上游不可用时退回到本地已过期的数据并标记为stale"""
+    _stats["upstream_fetches"] += 1
+    try:
+        return await fetch
+    except Exception as e:
+        if not is_upstream_failure(e):
+            raise
+        data = await _load_quietly(expired_loader, tmdb_id, media_type)
+        if data is None:
+            raise
+        _stats["stale_served"] += 1
+        return {**data, "stale": True}
+
+async def fetch_title(
+    client: httpx.AsyncClient,
+    tmdb_id: int,
+    media_type: str,
+    force_refresh: bool = False
+) -> Tuple[Dict, Dict]:
+    """通过 append_to_response=credits 一次请求获取详情和演职人员信息，并写入目录
+
+    返回 (详情, 规范化后的演职人员信息)。force_refresh 为True时跳过TMDB响应缓存。TMDB返回错误时抛出 httpx.HTTPStatusError；
+    上游不可用时可能返回本地的旧数据，两部分都带 "stale": True。
+    """
+    data = await _fetch_or_expired(tmdb_get(client, f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}", {
+        "api_key": TMDB_API_KEY,
+        "language": "zh-CN",
+        "append_to_response": "credits"
+    }, force_refresh=force_refresh), load_expired_title, tmdb_id, media_type)
+
+    raw_credits = data.get("credits") or {}
+    details = {key: value for key, value in data.items() if key != "credits"}
+    credits = normalize_credits(raw_credits)
+    if data.get("stale"):
+        # 过期数据不写回目录，避免刷新其获取时间
+        return details, {**credits, "stale": True}
+
+    await store_title(tmdb_id, media_type, details=details, credits=raw_credits)
+    return details, credits
+
+async def get_title(client: httpx.AsyncClient, tmdb_id: int, media_type: str) -> Tuple[Dict, Dict]:
+    """获取详情和演职人员信息：都在有效期内时读本地目录，否则一次请求TMDB"""
+    title = await _load_quietly(load_fresh_title, tmdb_id, media_type)
+    if title is not None:
+        _stats["local_hits"] += 1
+        return title
+    return await fetch_title(client, tmdb_id, media_type)
+
+async def get_title_details(client: httpx.AsyncClient, tmdb_id: int, media_type: str) -> Dict:
+    """获取影视详情：有效期内读本地目录，否则请求TMDB（同时获取演职人员信息）并写入目录
+
+    TMDB返回错误时抛出 httpx.HTTPStatusError；上游不可用时可能返回带 "stale": True 的旧数据。
+    """
+    details = await _load_quietly(load_fresh_details, tmdb_id, media_type)
+    if details is not None:
+        _stats["local_hits"] += 1
+        return details
+
+    details, _ = await fetch_title(client, tmdb_id, media_type)
+    return details
+
+async def get_title_credits(client: httpx.AsyncClient, tmdb_id: int, media_type: str) -> Dict:
+    """获取演职人员信息：有效期内读本地目录，否则请求TMDB（同时获取详情）并写入目录
+
+    返回的数据只包含 normalize_credits 保留的字段。
+    """
+    credits = await _load_quietly(load_fresh_credits, tmdb_id, media_type)
+    if credits is not None:
+        _stats["local_hits"] += 1
+        return credits
+
+    _, credits = await fetch_title(client, tmdb_id, media_type)
+    return credits
+
+def catalog_stats() -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        titles = db.query(Title).count()
+    finally:
+        db.close()
+    return {**_stats, "titles": titles}
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+import httpx
+from sqlalchemy.orm.attributes import flag_modified
+
+from database import SessionLocal
+from models import Title, WatchStatus
+from tmdb_client import tmdb_get, TMDB_API_KEY, TMDB_BASE_URL
+from title_catalog import fetch_title, TITLE_CATALOG_MAX_AGE_HOURS
+from upstream_priority import upstream_priority, BATCH
+from routers.watch_status import apply_title_metadata
+
+TITLE_REFRESH_ENABLED = os.getenv("TITLE_REFRESH_ENABLED", "true").lower() == "true"
+# 两次增量刷新的间隔（秒）
+TITLE_REFRESH_INTERVAL = float(os.getenv("TITLE_REFRESH_INTERVAL", str(12 * 3600)))
+# 刷新失败后的重试间隔（秒）
+TITLE_REFRESH_RETRY_INTERVAL = float(os.getenv("TITLE_REFRESH_RETRY_INTERVAL", "600"))
+# 启动后第一轮查询最近几天的变更
+TITLE_REFRESH_LOOKBACK_DAYS = int(os.getenv("TITLE_REFRESH_LOOKBACK_DAYS", "1"))
+# 并发重新获取的影视数量
+TITLE_REFRESH_CONCURRENCY = int(os.getenv("TITLE_REFRESH_CONCURRENCY", "4"))
+
+# TMDB 变更接口单次查询的最大时间范围
+TMDB_CHANGES_MAX_DAYS = 14
+# 按ID批量查询本地数据时每批的数量
+ID_QUERY_CHUNK_SIZE = 500
+
+REFRESH_MEDIA_TYPES = ("movie", "tv")
+
+def _chunks(ids: List[int], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def stored_title_ids(media_type: str, candidate_ids: Set[int]) -> Set[int]:
+    """候选ID中本地保存的部分：观看记录中的影视，以及影视目录中仍在有效期内的条目
+
+    影视目录中已过期的条目下次访问时会重新获取，不需要主动刷新。
+    电影和电视剧的ID会重复，没有记录媒体类型的旧观看记录无法判断，不参与刷新。
+    """
+    fresh_since = datetime.utcnow() - timedelta(hours=TITLE_CATALOG_MAX_AGE_HOURS)
+    stored = set()
+    db = SessionLocal()
+    try:
+        for chunk in _chunks(sorted(candidate_ids), ID_QUERY_CHUNK_SIZE):
+            stored.update(
+                row.movie_id for row in db.query(WatchStatus.movie_id)
+                .filter(WatchStatus.movie_id.in_(chunk), WatchStatus.media_type == media_type)
+                .distinct()
+            )
+            stored.update(
+                row.tmdb_id for row in db.query(Title.tmdb_id)
+                .filter(
+                    Title.tmdb_id.in_(chunk),
+                    Title.media_type == media_type,
+                    Title.details_fetched_at >= fresh_since
+                )
+            )
+    finally:
+        db.close()
+    return stored
+
+def update_watch_statuses(tmdb_id: int, media_type: str, details: Dict, credits: Dict) -> int:
+    """用新获取的数据更新所有用户中该影视的观看记录，返回有变化的记录数
+
+    updated_at 记录用户自己的修改（列表按它排序），这里保持不变；
+    列表的ETag由版本号失效，不依赖 updated_at。
+    """
+    db = SessionLocal()
+    try:
+        updated = 0
+        rows = db.query(WatchStatus).filter(WatchStatus.movie_id == tmdb_id, WatchStatus.media_type == media_type).all()
+        for row in rows:
+            if apply_title_metadata(row, media_type, details, credits):
+                # 显式写回原值，避免 onupdate 自动刷新 updated_at
+                flag_modified(row, "updated_at")
+                updated += 1
+        db.commit()
+        return updated
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+class TitleRefresher:
+    """按TMDB变更记录增量刷新本地保存的影视元数据
+
+    定期查询 /movie/changes 和 /tv/changes，与观看记录和影视目录中保存的ID取交集，
+    只重新获取确实有变更的影视，并同步更新所有用户的观看记录；
+    刷新成本取决于上游的变更量，而不是本地库的大小。
+    请求以批量优先级经过TMDB限流器，不影响用户请求。
+    变更记录按日期查询，每轮从上次成功的时间开始，启动后的第一轮查询最近 TITLE_REFRESH_LOOKBACK_DAYS 天。
+    """
+
+    def __init__(self, interval: float = TITLE_REFRESH_INTERVAL, lookback_days: int = TITLE_REFRESH_LOOKBACK_DAYS):
+        self.interval = interval
+        self.lookback_days = lookback_days
+        self._task: Optional[asyncio.Task] = None
+        self.checked_until: Optional[datetime] = None
+        self.runs = 0
+        self.changed = 0
+        self.matched = 0
+        self.refreshed = 0
+        self.rows_updated = 0
+        self.failed = 0
+        self.last_window: Optional[Dict[str, str]] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def changed_ids(self, client: httpx.AsyncClient, media_type: str, start: datetime, end: datetime) -> Set[int]:
+        """获取时间范围内TMDB有变更的影视ID（逐页获取）"""
+        ids = set()
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            data = await tmdb_get(client, f"{TMDB_BASE_URL}/{media_type}/changes", {
+                "api_key": TMDB_API_KEY,
+                "start_date": start.strftime("%Y-%m-%d"),
+                "end_date": end.strftime("%Y-%m-%d"),
+                "page": page
+            }, force_refresh=True)
+            ids.update(item["id"] for item in data.get("results", []) if item.get("id") is not None)
+            total_pages = data.get("total_pages") or 1
+            page += 1
+        return ids
+
+    async def _refresh_title(self, client: httpx.AsyncClient, tmdb_id: int, media_type: str, semaphore: asyncio.Semaphore) -> bool:
+        async with semaphore:
+            try:
+                details, credits = await fetch_title(client, tmdb_id, media_type, force_refresh=True)
+            except httpx.HTTPStatusError as e:
+                # 已从TMDB删除等情况，保留本地数据
+                print(f"增量刷新跳过: {tmdb_id} ({media_type}), {e.response.status_code}")
+                return True
+            except Exception as e:
+                self.failed += 1
+                print(f"增量刷新失败: {tmdb_id} ({media_type}), {str(e)}")
+                return False
+
+        if details.get("stale"):
+            # 上游不可用时拿到的是本地旧数据，下一轮重试
+            self.failed += 1
+            return False
+
+        self.refreshed += 1
+        try:
+            self.rows_updated += update_watch_statuses(tmdb_id, media_type, details, credits)
+        except Exception as e:
+            self.failed += 1
+            print(f"更新观看记录失败: {tmdb_id} ({media_type}), {str(e)}")
+            return False
+        return True
+
+    async def refresh(self, client: httpx.AsyncClient) -> bool:
+        """刷新一轮，返回是否全部成功；全部成功时下一轮从本轮开始的时间继续"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        start = self.checked_until or now - timedelta(days=self.lookback_days)
+        start = max(start, now - timedelta(days=TMDB_CHANGES_MAX_DAYS))
+        self.last_window = {"start_date": start.strftime("%Y-%m-%d"), "end_date": now.strftime("%Y-%m-%d")}
+
+        errors = []
+        ok = True
+        semaphore = asyncio.Semaphore(TITLE_REFRESH_CONCURRENCY)
+        for media_type in REFRESH_MEDIA_TYPES:
+            try:
+                changed = await self.changed_ids(client, media_type, start, now)
+            except Exception as e:
+                errors.append(f"{media_type}/changes: {str(e)}")
+                continue
+
+            matched = stored_title_ids(media_type, changed)
+            self.changed += len(changed)
+            self.matched += len(matched)
+            results = await asyncio.gather(*[
+                self._refresh_title(client, tmdb_id, media_type, semaphore) for tmdb_id in sorted(matched)
+            ])
+            if not all(results):
+                ok = False
+
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        self.last_duration = round(time.monotonic() - started, 3)
+        self.last_error = "; ".join(errors) if errors else None
+        if errors:
+            print(f"增量刷新部分失败: {self.last_error}")
+        if ok and not errors:
+            self.checked_until = now
+            return True
+        return False
+
+    def start(self, client: httpx.AsyncClient):
+        """启动后台刷新任务"""
+        if TITLE_REFRESH_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop(client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self, client: httpx.AsyncClient):
+        while True:
+            try:
+                with upstream_priority(BATCH):
+                    ok = await self.refresh(client)
+            except Exception as e:
+                ok = False
+                self.last_error = str(e)
+                print(f"增量刷新失败: {str(e)}")
+            await asyncio.sleep(self.interval if ok else min(self.interval, TITLE_REFRESH_RETRY_INTERVAL))
+
+    def status(self) -> Dict:
+        return {
+            "enabled": TITLE_REFRESH_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "checked_until": self.checked_until.isoformat() if self.checked_until else None,
+            "last_window": self.last_window,
+            "runs": self.runs,
+            "changed": self.changed,
+            "matched": self.matched,
+            "refreshed": self.refreshed,
+            "rows_updated": self.rows_updated,
+            "failed": self.failed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error
+        }
+
+title_refresher = TitleRefresher()
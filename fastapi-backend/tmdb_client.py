@@ -0,0 +1,423 @@
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+import httpx
+from dotenv import load_dotenv
+
+from cache import TTLCache
+from circuit_breaker import CircuitBreaker
+from hedging import RequestHedger
+from rate_limiter import TokenBucket
+from upstream_priority import current_priority, upstream_priority, SharedPriority, INTERACTIVE, PREFETCH, PRIORITY_NAMES
+
+load_dotenv()
+
+TMDB_API_KEY = os.getenv("TMDB_API_KEY", "be3849411a172c7f817c762b765ec656")
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+
+# 所有TMDB请求共享的限流配置（TMDB约为每秒50个请求）
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = float(os.getenv("TMDB_RATE_BURST", "40"))
+# 预取和批量请求为交互请求保留的令牌数：可用令牌不多于保留数时只有更高优先级的请求能获取
+TMDB_PREFETCH_RESERVED_TOKENS = float(os.getenv("TMDB_PREFETCH_RESERVED_TOKENS", str(TMDB_RATE_BURST / 4)))
+TMDB_BATCH_RESERVED_TOKENS = float(os.getenv("TMDB_BATCH_RESERVED_TOKENS", str(TMDB_RATE_BURST / 2)))
+# 429/5xx 时的重试次数和退避基准（秒）
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_BACKOFF_BASE = float(os.getenv("TMDB_BACKOFF_BASE", "0.5"))
+TMDB_BACKOFF_MAX = float(os.getenv("TMDB_BACKOFF_MAX", "10"))
+# 单次TMDB请求的超时（秒），比连接池默认的30秒短，故障时尽快失败
+TMDB_REQUEST_TIMEOUT = float(os.getenv("TMDB_REQUEST_TIMEOUT", "8"))
+# 熔断：连续失败次数阈值和打开后等待探测的时间（秒）
+TMDB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("TMDB_BREAKER_FAILURE_THRESHOLD", "5"))
+TMDB_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("TMDB_BREAKER_RECOVERY_TIMEOUT", "30"))
+# 上游不可用时可以返回过期缓存的接口类别，以及同时进行的后台重新验证数量上限
+STALE_KINDS = {"detail", "credits", "genres", "popular", "discover"}
+TMDB_MAX_REVALIDATIONS = int(os.getenv("TMDB_MAX_REVALIDATIONS", "100"))
+TMDB_REVALIDATE_ATTEMPTS = 5
+# 请求对冲：这些类别的请求超过近期p95仍未返回时再发一个相同请求，取先返回的结果
+# 对冲请求占普通请求的比例上限；设为0关闭
+TMDB_HEDGE_KINDS = [kind.strip() for kind in os.getenv("TMDB_HEDGE_KINDS", "detail,credits,discover").split(",") if kind.strip()]
+TMDB_HEDGE_MAX_RATIO = float(os.getenv("TMDB_HEDGE_MAX_RATIO", "0.05"))
+TMDB_HEDGE_MIN_DELAY = float(os.getenv("TMDB_HEDGE_MIN_DELAY", "0.05"))
+
+# 各类TMDB接口的缓存配置：(TTL秒, 最大条目数, 最大字节数)
+# TTL可通过 TMDB_CACHE_TTL_<类别> 环境变量覆盖，例如 TMDB_CACHE_TTL_DETAIL=3600
+CACHE_CONFIG = {
+    "detail": (6 * 3600, 2000, 64 * 1024 * 1024),
+    "credits": (6 * 3600, 2000, 64 * 1024 * 1024),
+    "genres": (24 * 3600, 20, 1024 * 1024),
+    "popular": (30 * 60, 200, 16 * 1024 * 1024),
+    "discover": (30 * 60, 1000, 32 * 1024 * 1024),
+    "search": (10 * 60, 1000, 32 * 1024 * 1024),
+    "default": (5 * 60, 500, 16 * 1024 * 1024),
+}
+
+# 按URL路径判断接口类别
+_KIND_PATTERNS = [
+    (re.compile(r"/genre/(movie|tv)/list$"), "genres"),
+    (re.compile(r"/(movie|tv)/popular$"), "popular"),
+    (re.compile(r"/discover/(movie|tv)$"), "discover"),
+    (re.compile(r"/search/\w+$"), "search"),
+    (re.compile(r"/(movie|tv)/\d+/credits$"), "credits"),
+    (re.compile(r"/(movie|tv)/\d+$"), "detail"),
+]
+
+def _build_caches() -> Dict[str, TTLCache]:
+    caches = {}
+    for kind, (ttl, max_entries, max_bytes) in CACHE_CONFIG.items():
+        ttl = float(os.getenv(f"TMDB_CACHE_TTL_{kind.upper()}", ttl))
+        caches[kind] = TTLCache(f"tmdb_{kind}", ttl, max_entries, max_bytes)
+    return caches
+
+_caches = _build_caches()
+
+# 正在进行中的上游请求：相同key的并发请求共享同一个任务
+_inflight: Dict[str, asyncio.Task] = {}
+_waiters: Dict[asyncio.Task, int] = {}
+# 进行中请求的优先级，更高优先级的调用方加入时提升
+_inflight_priorities: Dict[str, SharedPriority] = {}
+_singleflight_stats = {"leaders": 0, "coalesced": 0, "promoted": 0}
+
+rate_limiter = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_BURST, priorities=list(zip(
+    PRIORITY_NAMES, (0.0, TMDB_PREFETCH_RESERVED_TOKENS, TMDB_BATCH_RESERVED_TOKENS)
+)))
+_retry_stats = {"retries": 0, "throttled": 0, "server_errors": 0}
+
+circuit_breaker = CircuitBreaker(TMDB_BREAKER_FAILURE_THRESHOLD, TMDB_BREAKER_RECOVERY_TIMEOUT)
+hedger = RequestHedger(TMDB_HEDGE_KINDS, max_ratio=TMDB_HEDGE_MAX_RATIO, min_delay=TMDB_HEDGE_MIN_DELAY)
+# 过期数据的后台重新验证任务：key -> task
+_revalidating: Dict[str, asyncio.Task] = {}
+_stale_stats = {"served": 0, "revalidated": 0}
+
+class UpstreamUnavailableError(Exception):
+    """熔断器打开且没有可用的过期缓存时抛出"""
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """是否为上游故障（网络错误、超时、429/5xx或熔断），而不是请求本身的错误"""
+    if isinstance(error, (httpx.TransportError, UpstreamUnavailableError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+def endpoint_kind(url: str) -> str:
+    """根据URL判断TMDB接口类别"""
+    path = httpx.URL(url).path.rstrip("/")
+    for pattern, kind in _KIND_PATTERNS:
+        if pattern.search(path):
+            return kind
+    return "default"
+
+def _param_value(value: Any) -> str:
+    # 与httpx的编码方式保持一致，避免 False 和 "false" 生成不同的key
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+def make_cache_key(url: str, params: Optional[dict] = None) -> str:
+    """规范化的缓存key：URL + 排序后的参数（去掉api_key）"""
+    items = sorted(
+        (key, _param_value(value))
+        for key, value in (params or {}).items()
+        if key != "api_key" and value is not None
+    )
+    return f"{url.rstrip('/')}?{urlencode(items)}"
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """解析Retry-After头（秒数或HTTP日期）"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_delay(attempt: int) -> float:
+    # 指数退避 + 全抖动
+    return random.uniform(0, min(TMDB_BACKOFF_MAX, TMDB_BACKOFF_BASE * (2 ** attempt)))
+
+async def _timed_get(client: httpx.AsyncClient, url: str, params: dict) -> tuple:
+    started = time.monotonic()
+    response = await client.get(url, params=params, timeout=TMDB_REQUEST_TIMEOUT)
+    return response, time.monotonic() - started
+
+async def acquire_token(priority: SharedPriority):
+    """按共享优先级获取限流令牌；排队期间优先级被提升时，转到更高优先级的队列重新排队"""
+    while True:
+        level = priority.value
+        raised = asyncio.ensure_future(priority.raised.wait())
+        acquire = asyncio.ensure_future(rate_limiter.acquire(level))
+        try:
+            await asyncio.wait({acquire, raised}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            raised.cancel()
+            if not acquire.done():
+                # 令牌在没有等待点的情况下扣除，取消排队不会丢失令牌
+                acquire.cancel()
+        if acquire.done() and not acquire.cancelled():
+            acquire.result()
+            return
+
+async def send_hedged(client: httpx.AsyncClient, url: str, params: dict, kind: str, priority: int) -> httpx.Response:
+    """发送一次请求；超过该类别的p95仍未返回时，在额度和限流允许下再发一个相同请求
+
+    使用先成功返回的响应并取消另一个；两个都失败时抛出原请求的异常。
+    耗时样本始终记录原请求的耗时：对冲请求先返回时，记录原请求到此为止的耗时（实际耗时的下限），
+    只记录胜出者会让慢请求从样本中消失，使p95偏低、对冲越来越频繁。
+    """
+    # 只对用户正在等待的请求对冲
+    delay = hedger.hedge_delay(kind) if priority == INTERACTIVE else None
+    started = time.monotonic()
+    primary = asyncio.ensure_future(_timed_get(client, url, params))
+    if delay is None:
+        response, elapsed = await primary
+        hedger.record_latency(kind, elapsed)
+        return response
+
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        # 对冲请求同样占用限流令牌，没有空闲令牌时不发送
+        if not done and hedger.try_hedge(lambda: rate_limiter.try_acquire(priority)):
+            tasks.append(asyncio.ensure_future(_timed_get(client, url, params)))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task in done and task.exception() is None:
+                    response, elapsed = task.result()
+                    if task is primary:
+                        hedger.record_latency(kind, elapsed)
+                    else:
+                        hedger.record_latency(kind, time.monotonic() - started)
+                        hedger.record_win()
+                    return response
+        return primary.result()[0]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def send_with_retry(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    kind: str = "default",
+    priority: Optional[SharedPriority] = None
+) -> httpx.Response:
+    """按上游优先级经过限流器发送请求，429/5xx和连接失败时按Retry-After或指数退避重试
+
+    priority 默认为当前的上游优先级。
+    """
+    priority = priority or SharedPriority(current_priority())
+    attempt = 0
+    while True:
+        await acquire_token(priority)
+        try:
+            response = await send_hedged(client, url, params, kind, priority.value)
+        except httpx.ConnectError:
+            if attempt >= TMDB_MAX_RETRIES or circuit_breaker.state == circuit_breaker.OPEN:
+                raise
+            delay = _backoff_delay(attempt)
+        else:
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            # 熔断器已打开时不再重试，尽快把故障交给调用方处理
+            if attempt >= TMDB_MAX_RETRIES or circuit_breaker.state == circuit_breaker.OPEN:
+                return response
+
+            if response.status_code == 429:
+                _retry_stats["throttled"] += 1
+                retry_after = _retry_after_seconds(response)
+                delay = retry_after + random.uniform(0, TMDB_BACKOFF_BASE) if retry_after is not None else _backoff_delay(attempt)
+                # 上游已限流，所有调用方一起暂停
+                rate_limiter.pause(delay)
+            else:
+                _retry_stats["server_errors"] += 1
+                delay = _backoff_delay(attempt)
+
+        _retry_stats["retries"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+async def _fetch_and_cache(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict,
+    kind: str,
+    cache: TTLCache,
+    key: str,
+    priority: SharedPriority
+) -> Any:
+    try:
+        response = await send_with_retry(client, url, params, kind, priority)
+    except asyncio.CancelledError:
+        circuit_breaker.record_cancelled()
+        raise
+    except Exception:
+        # 任何异常都要记录，否则 half_open 的探测名额不会释放，熔断器一直拒绝请求
+        circuit_breaker.record_failure()
+        raise
+
+    if response.status_code == 429 or response.status_code >= 500:
+        circuit_breaker.record_failure()
+    else:
+        # 404等客户端错误说明上游可以正常响应
+        circuit_breaker.record_success()
+    response.raise_for_status()
+    data = response.json()
+    cache.set(key, data, size=len(response.content))
+    return data
+
+async def _revalidate(client: httpx.AsyncClient, url: str, params: dict, kind: str):
+    """上游恢复后在后台刷新过期的缓存，熔断期间按恢复时间间隔重试"""
+    for _ in range(TMDB_REVALIDATE_ATTEMPTS):
+        await asyncio.sleep(circuit_breaker.recovery_timeout)
+        try:
+            with upstream_priority(PREFETCH):
+                await tmdb_get(client, url, params, kind=kind, force_refresh=True)
+            _stale_stats["revalidated"] += 1
+            return
+        except Exception as e:
+            if not is_upstream_failure(e):
+                return
+
+def _serve_stale(client: httpx.AsyncClient, url: str, params: dict, kind: str, cache: TTLCache, key: str, error: Exception) -> Any:
+    """返回标记为stale的过期缓存并安排后台重新验证，没有可用数据时抛出原来的错误"""
+    stale = cache.get_stale(key) if kind in STALE_KINDS else None
+    if stale is None:
+        raise error
+
+    _stale_stats["served"] += 1
+    if key not in _revalidating and len(_revalidating) < TMDB_MAX_REVALIDATIONS:
+        task = asyncio.ensure_future(_revalidate(client, url, params, kind))
+        _revalidating[key] = task
+        task.add_done_callback(lambda t: _revalidating.pop(key, None))
+
+    if isinstance(stale, dict):
+        return {**stale, "stale": True}
+    return stale
+
+async def stop_revalidation():
+    """取消所有后台重新验证任务（关闭HTTP客户端前调用）"""
+    tasks = list(_revalidating.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def _on_inflight_done(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+        _inflight_priorities.pop(key, None)
+    _waiters.pop(task, None)
+    # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+async def tmdb_get(
+    client: httpx.AsyncClient,
+    url: str,
+    params: Optional[dict] = None,
+    kind: Optional[str] = None,
+    force_refresh: bool = False
+) -> Any:
+    """带缓存的TMDB GET请求，返回解析后的JSON
+
+    非2xx响应抛出 httpx.HTTPStatusError，只缓存成功的响应。
+    相同的并发请求只会向上游发送一次，结果和异常由所有等待者共享；
+    请求按等待者中最高的上游优先级获取令牌，全部等待者取消时上游请求也会被取消。
+    上游故障或熔断期间，STALE_KINDS 类别的接口返回带 "stale": True 的过期缓存，
+    并在后台重新验证；没有过期缓存时抛出原错误或 UpstreamUnavailableError。
+    force_refresh=True 时跳过缓存读取且不返回过期数据，但仍会用新结果更新缓存。
+    返回值可能与其他请求共享，调用方不应修改。
+    """
+    kind = kind or endpoint_kind(url)
+    cache = _caches.get(kind, _caches["default"])
+    key = make_cache_key(url, params)
+
+    if not force_refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        if not circuit_breaker.allow_request():
+            error = UpstreamUnavailableError("TMDB暂时不可用")
+            if force_refresh:
+                raise error
+            return _serve_stale(client, url, dict(params or {}), kind, cache, key, error)
+
+        # 复制参数，调用方之后修改params不会影响进行中的请求
+        priority = SharedPriority(current_priority())
+        task = asyncio.ensure_future(_fetch_and_cache(client, url, dict(params or {}), kind, cache, key, priority))
+        _inflight[key] = task
+        _inflight_priorities[key] = priority
+        task.add_done_callback(lambda t: _on_inflight_done(key, t))
+        _singleflight_stats["leaders"] += 1
+    else:
+        _singleflight_stats["coalesced"] += 1
+        # 交互请求加入预取发起的请求时，把该请求提升到交互优先级，不在低优先级队列中等待
+        priority = _inflight_priorities.get(key)
+        if priority is not None and priority.raise_to(current_priority()):
+            _singleflight_stats["promoted"] += 1
+
+    # shield：单个调用方被取消时不会取消其他调用方共享的上游请求，
+    # 只有所有等待者都取消后才取消上游请求
+    _waiters[task] = _waiters.get(task, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if not task.done() and _waiters.get(task) == 1:
+            task.cancel()
+        raise
+    except Exception as e:
+        if force_refresh or not is_upstream_failure(e):
+            raise
+        return _serve_stale(client, url, dict(params or {}), kind, cache, key, e)
+    finally:
+        if task in _waiters:
+            _waiters[task] -= 1
+
+def cache_ttl(kind: str) -> float:
+    """某类接口缓存的有效期（秒）"""
+    return _caches.get(kind, _caches["default"]).ttl
+
+def cache_stats() -> Dict[str, Any]:
+    """各类接口缓存的命中、未命中和淘汰统计"""
+    return {kind: cache.stats() for kind, cache in _caches.items()}
+
+def upstream_stats() -> Dict[str, Any]:
+    """TMDB上游访问的运行统计"""
+    return {
+        "cache": cache_stats(),
+        "single_flight": {
+            **_singleflight_stats,
+            "inflight": len(_inflight)
+        },
+        "rate_limiter": {
+            **rate_limiter.stats(),
+            **_retry_stats
+        },
+        "circuit_breaker": circuit_breaker.stats(),
+        "hedging": hedger.stats(),
+        "stale": {
+            **_stale_stats,
+            "revalidating": len(_revalidating)
+        }
+    }
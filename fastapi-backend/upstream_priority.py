@@ -0,0 +1,53 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 上游调用的优先级（数值越小越优先）
+INTERACTIVE = 0   # 用户正在等待的请求：搜索、详情等
+PREFETCH = 1      # 预取和后台刷新：缓存预热、过期数据重新验证、题材目录刷新
+BATCH = 2         # 批量补全：观看记录的元数据更新等
+
+PRIORITY_NAMES = ("interactive", "prefetch", "batch")
+
+# 在异步任务间自动传递：创建任务时复制当前的优先级
+_current_priority: ContextVar[int] = ContextVar("upstream_priority", default=INTERACTIVE)
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+@contextmanager
+def upstream_priority(priority: int):
+    """在该范围内（包括其中创建的任务）发出的上游调用使用指定的优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+async def batch_priority():
+    """路由依赖项：该请求发出的上游调用使用批量优先级"""
+    _current_priority.set(BATCH)
+
+class SharedPriority:
+    """多个调用方共享的上游请求（单飞）的优先级
+
+    更高优先级的调用方加入等待时提升，正在排队获取令牌的请求随之转到更高优先级的队列。
+    """
+
+    def __init__(self, priority: int):
+        self.value = priority
+        self._raised = asyncio.Event()
+
+    @property
+    def raised(self) -> asyncio.Event:
+        """下一次提升时触发的事件"""
+        return self._raised
+
+    def raise_to(self, priority: int) -> bool:
+        """提升到指定的优先级（只升不降），返回是否提升"""
+        if priority >= self.value:
+            return False
+        self.value = priority
+        self._raised.set()
+        self._raised = asyncio.Event()
+        return True
@@ -228,7 +228,8 @@ const MovieCard: React.FC<MovieCardProps> = ({ movie, onWatchStatusChange, showD
     if (onCardClick) {
       onCardClick();
     } else {
-      navigate(`/movie/${movie.id}`);
+      // 电影和电视剧的ID会重复，详情页需要知道类型
+      navigate(`/movie/${movie.id}?type=${movie.media_type || (movie.title ? 'movie' : 'tv')}`);
     }
   };
 
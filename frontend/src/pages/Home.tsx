@@ -16,6 +16,8 @@ const Home: React.FC<HomeProps> = ({ user, onWatchStatusChange }) => {
   const [totalPages, setTotalPages] = useState(1);
   const [isSearchMode, setIsSearchMode] = useState(false);
   const [currentSearchParams, setCurrentSearchParams] = useState<SearchParams | null>(null);
+  // 搜索模式下各页对应的游标（页码 -> 上一页返回的next_cursor）
+  const [pageCursors, setPageCursors] = useState<Record<number, string>>({});
   const [userWatchStatus, setUserWatchStatus] = useState<WatchStatus[]>([]);
 
   useEffect(() => {
@@ -65,6 +67,14 @@ const Home: React.FC<HomeProps> = ({ user, onWatchStatusChange }) => {
       setMovies(data.results || []);
       setCurrentPage(data.page);
       setTotalPages(data.total_pages);
+      // 新的搜索条件时清空之前的游标，记录下一页的游标
+      setPageCursors(prev => {
+        const cursors = params.page && params.page > 1 ? { ...prev } : {};
+        if (data.next_cursor) {
+          cursors[data.page + 1] = data.next_cursor;
+        }
+        return cursors;
+      });
     } catch (error) {
       console.error('搜索电影失败:', error);
     } finally {
@@ -101,8 +111,8 @@ const Home: React.FC<HomeProps> = ({ user, onWatchStatusChange }) => {
   const handlePageChange = (newPage: number) => {
     if (newPage >= 1 && newPage <= totalPages && newPage !== currentPage) {
       if (isSearchMode && currentSearchParams) {
-        // 如果在搜索模式，使用搜索参数翻页
-        handleSearch({ ...currentSearchParams, page: newPage });
+        // 如果在搜索模式，使用搜索参数翻页（有游标时从上一页结束的位置继续）
+        handleSearch({ ...currentSearchParams, page: newPage, cursor: pageCursors[newPage] });
       } else {
         // 否则使用热门电影翻页
         loadPopularMovies(newPage);
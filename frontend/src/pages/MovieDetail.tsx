@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { useParams, useNavigate } from 'react-router-dom';
+import { useParams, useNavigate, useSearchParams } from 'react-router-dom';
 import { Movie, User, WatchStatus, MovieEdit } from '../types';
 import { movieApi, getImageUrl, getMovieTitle, getMovieYear, watchStatusApi, movieEditApi } from '../services/api';
 
@@ -11,6 +11,9 @@ interface MovieDetailProps {
 
 const MovieDetail: React.FC<MovieDetailProps> = ({ user, onWatchStatusChange, onTagUpdate }) => {
   const { id } = useParams<{ id: string }>();
+  const [searchParams] = useSearchParams();
+  const typeParam = searchParams.get('type');
+  const mediaType = typeParam === 'movie' || typeParam === 'tv' ? typeParam : undefined;
   const navigate = useNavigate();
   const [movie, setMovie] = useState<Movie | null>(null);
   const [loading, setLoading] = useState(true);
@@ -24,7 +27,7 @@ const MovieDetail: React.FC<MovieDetailProps> = ({ user, onWatchStatusChange, on
     if (id) {
       loadMovieDetail();
     }
-  }, [id]);
+  }, [id, mediaType]);
 
   useEffect(() => {
     if (movie && user) {
@@ -38,7 +41,7 @@ const MovieDetail: React.FC<MovieDetailProps> = ({ user, onWatchStatusChange, on
     
     setLoading(true);
     try {
-      const movieData = await movieApi.getDetail(parseInt(id));
+      const movieData = await movieApi.getDetail(parseInt(id), mediaType);
       setMovie(movieData);
     } catch (error) {
       console.error('加载电影详情失败:', error);
@@ -196,7 +199,7 @@ const MovieDetail: React.FC<MovieDetailProps> = ({ user, onWatchStatusChange, on
   const displayTime = movieEdit?.custom_background_time || year;
   
   const backdropUrl = movie.backdrop_path 
-    ? `https://image.tmdb.org/t/p/w1280${movie.backdrop_path}` 
+    ? getImageUrl(movie.backdrop_path, 'w1280') 
     : getImageUrl(movie.poster_path);
 
   return (
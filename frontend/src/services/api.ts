@@ -19,16 +19,16 @@ api.interceptors.request.use((config) => {
 // 电影API
 export const movieApi = {
   search: (params: SearchParams): Promise<ApiResponse<Movie>> => 
-    api.get('/api/movies/search', { params }).then(res => res.data),
+    api.get('/api/movies/search', { params: { ...params, fields: 'card' } }).then(res => res.data),
   
   getGenres: (): Promise<Genre[]> => 
     api.get('/api/movies/genres').then(res => res.data),
   
   getPopular: (page = 1): Promise<ApiResponse<Movie>> => 
-    api.get('/api/movies/popular', { params: { page } }).then(res => res.data),
+    api.get('/api/movies/popular', { params: { page, fields: 'card' } }).then(res => res.data),
   
-  getDetail: (movieId: number): Promise<Movie> => 
-    api.get(`/api/movies/${movieId}`).then(res => res.data),
+  getDetail: (movieId: number, mediaType?: 'movie' | 'tv'): Promise<Movie> => 
+    api.get(`/api/movies/${movieId}`, { params: { fields: 'detail', media_type: mediaType } }).then(res => res.data),
 };
 
 // 用户API
@@ -86,9 +86,9 @@ export const movieEditApi = {
 };
 
 // 工具函数
-export const getImageUrl = (posterPath?: string): string => {
+export const getImageUrl = (posterPath?: string, size = 'w500'): string => {
   if (!posterPath) return 'https://via.placeholder.com/500x750/cccccc/666666?text=暂无海报';
-  return `https://image.tmdb.org/t/p/w500${posterPath}`;
+  return `${API_BASE_URL}/api/images/${size}${posterPath}`;
 };
 
 export const getMovieTitle = (movie: Movie): string => {
@@ -129,7 +129,7 @@ export const rawgApi = {
 // 游戏工具函数
 export const getGameImageUrl = (imagePath?: string): string => {
   if (!imagePath) return 'https://via.placeholder.com/500x300/cccccc/666666?text=暂无截图';
-  return imagePath;
+  return `${API_BASE_URL}/api/images/external?url=${encodeURIComponent(imagePath)}`;
 };
 
 export const getGameYear = (releaseDate?: string): string => {
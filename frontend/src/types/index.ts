@@ -81,6 +81,8 @@ export interface SearchParams {
   sortBy?: string;
   page?: number;
   excludeMarked?: boolean; // 是否排除已标记的电影
+  cursor?: string; // 上一页返回的next_cursor，从上一页结束的位置继续
+  withCredits?: boolean; // 为结果附加导演和主演
 }
 
 export interface ApiResponse<T> {
@@ -88,6 +90,8 @@ export interface ApiResponse<T> {
   total_pages: number;
   total_results: number;
   page: number;
+  next_cursor?: string | null; // 搜索接口返回的下一页游标
+  partial?: boolean; // 搜索超出时间预算，只返回了部分结果
 }
 
 // 游戏相关类型定义